@@ -127,6 +127,14 @@ STATIC_ROOT = os.path.join(BASE_DIR.parent.parent, "static")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Saving a genre or a person sets updated_at of all its film works, so the ETL in query mode
+# re-indexes them. Turn it off along with `etl.partial_updates` of the ETL in pipeline mode:
+# it reads genre and person changes on its own and updates only their fields in the index.
+# Deletions touch film works either way, links to a deleted row are gone before the ETL reads them.
+TOUCH_MOVIES_ON_RELATED_SAVE = (
+    os.environ.get("TOUCH_MOVIES_ON_RELATED_SAVE", "true").lower() == "true"
+)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": True,
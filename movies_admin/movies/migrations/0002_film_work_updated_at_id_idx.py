@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="filmwork",
+            index=models.Index(
+                fields=["updated_at", "id"], name="film_work_updated_at_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 3.2 on 2026-10-18 12:30
+
+from django.db import migrations
+
+# The ETL listens to this channel to re-index affected film works right away,
+# see postgres_to_es/notify.py. The channel must match postgres.notify_channel
+# of the ETL config, the ETL warns on startup otherwise.
+NOTIFY_TRIGGERS_SQL = """
+create or replace function content.notify_film_work_changed() returns trigger as
+$$
+declare
+    changed record;
+begin
+    if TG_OP = 'DELETE' then
+        changed := OLD;
+    else
+        changed := NEW;
+    end if;
+
+    if TG_TABLE_NAME = 'film_work' then
+        perform pg_notify('film_work_changed', changed.id::text);
+    elsif TG_TABLE_NAME in ('genre_film_work', 'person_film_work') then
+        perform pg_notify('film_work_changed', changed.film_work_id::text);
+    elsif TG_TABLE_NAME = 'genre' then
+        perform pg_notify('film_work_changed', gfw.film_work_id::text)
+        from content.genre_film_work gfw
+        where gfw.genre_id = changed.id;
+    elsif TG_TABLE_NAME = 'person' then
+        perform pg_notify('film_work_changed', pfw.film_work_id::text)
+        from content.person_film_work pfw
+        where pfw.person_id = changed.id;
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists film_work_notify on content.film_work;
+create trigger film_work_notify
+    after insert or update or delete on content.film_work
+    for each row execute function content.notify_film_work_changed();
+
+drop trigger if exists genre_notify on content.genre;
+create trigger genre_notify
+    after insert or update or delete on content.genre
+    for each row execute function content.notify_film_work_changed();
+
+drop trigger if exists person_notify on content.person;
+create trigger person_notify
+    after insert or update or delete on content.person
+    for each row execute function content.notify_film_work_changed();
+
+drop trigger if exists genre_film_work_notify on content.genre_film_work;
+create trigger genre_film_work_notify
+    after insert or update or delete on content.genre_film_work
+    for each row execute function content.notify_film_work_changed();
+
+drop trigger if exists person_film_work_notify on content.person_film_work;
+create trigger person_film_work_notify
+    after insert or update or delete on content.person_film_work
+    for each row execute function content.notify_film_work_changed();
+"""
+
+DROP_NOTIFY_TRIGGERS_SQL = """
+drop trigger if exists film_work_notify on content.film_work;
+drop trigger if exists genre_notify on content.genre;
+drop trigger if exists person_notify on content.person;
+drop trigger if exists genre_film_work_notify on content.genre_film_work;
+drop trigger if exists person_film_work_notify on content.person_film_work;
+drop function if exists content.notify_film_work_changed();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0002_film_work_updated_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.RunSQL(NOTIFY_TRIGGERS_SQL, DROP_NOTIFY_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2 on 2026-10-18 13:00
+
+from django.db import migrations
+
+# Logical replication sends only the primary key of deleted rows by default,
+# the ETL needs film_work_id of deleted links to re-index the film work.
+REPLICA_IDENTITY_FULL_SQL = """
+alter table content.genre_film_work replica identity full;
+alter table content.person_film_work replica identity full;
+"""
+
+REPLICA_IDENTITY_DEFAULT_SQL = """
+alter table content.genre_film_work replica identity default;
+alter table content.person_film_work replica identity default;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0003_film_work_notify_triggers"),
+    ]
+
+    operations = [
+        migrations.RunSQL(REPLICA_IDENTITY_FULL_SQL, REPLICA_IDENTITY_DEFAULT_SQL),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0004_link_tables_replica_identity"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="genre",
+            index=models.Index(
+                fields=["updated_at", "id"], name="genre_updated_at_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="filmworkgenre",
+            index=models.Index(
+                fields=["created_at", "id"], name="genre_film_work_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="person",
+            index=models.Index(
+                fields=["updated_at", "id"], name="person_updated_at_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="personfilmwork",
+            index=models.Index(
+                fields=["created_at", "id"], name="person_film_work_created_idx"
+            ),
+        ),
+    ]
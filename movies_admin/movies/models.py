@@ -25,6 +25,10 @@ class Genre(TimeStampedMixin, models.Model):
         verbose_name = _("genre")
         verbose_name_plural = _("genres")
         db_table = '"content"."genre"'
+        indexes = [
+            # Keyset pagination index used by the ETL, see postgres_to_es/queries.
+            models.Index(fields=["updated_at", "id"], name="genre_updated_at_id_idx"),
+        ]
 
 
 class FilmworkGenre(models.Model):
@@ -35,6 +39,12 @@ class FilmworkGenre(models.Model):
 
     class Meta:
         db_table = '"content"."genre_film_work"'
+        indexes = [
+            # Keyset pagination index used by the ETL, see postgres_to_es/queries.
+            models.Index(
+                fields=["created_at", "id"], name="genre_film_work_created_idx"
+            ),
+        ]
 
 
 class Person(TimeStampedMixin, models.Model):
@@ -49,6 +59,10 @@ class Person(TimeStampedMixin, models.Model):
         verbose_name = _("person")
         verbose_name_plural = _("persons")
         db_table = '"content"."person"'
+        indexes = [
+            # Keyset pagination index used by the ETL, see postgres_to_es/queries.
+            models.Index(fields=["updated_at", "id"], name="person_updated_at_id_idx"),
+        ]
 
 
 class RoleType(models.TextChoices):
@@ -66,6 +80,12 @@ class PersonFilmWork(models.Model):
 
     class Meta:
         db_table = '"content"."person_film_work"'
+        indexes = [
+            # Keyset pagination index used by the ETL, see postgres_to_es/queries.
+            models.Index(
+                fields=["created_at", "id"], name="person_film_work_created_idx"
+            ),
+        ]
 
 
 class FilmworkType(models.TextChoices):
@@ -96,3 +116,9 @@ class Filmwork(TimeStampedMixin, models.Model):
         verbose_name = _("film_work")
         verbose_name_plural = _("filmworks")
         db_table = '"content"."film_work"'
+        indexes = [
+            # Keyset pagination index used by the ETL, see postgres_to_es/queries.
+            models.Index(
+                fields=["updated_at", "id"], name="film_work_updated_at_id_idx"
+            ),
+        ]
@@ -1,6 +1,7 @@
 import datetime
 from typing import Sequence
 
+from django.conf import settings
 from django.db import connection
 from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
@@ -24,7 +25,8 @@ def touch_movies(film_works: Sequence[Filmwork]):
 
 @receiver(post_save, sender="movies.Genre")
 def save_genre(instance, **kwargs):
-    touch_movies(instance.filmwork_set.all())
+    if settings.TOUCH_MOVIES_ON_RELATED_SAVE:
+        touch_movies(instance.filmwork_set.all())
 
 
 @receiver(pre_delete, sender="movies.Genre")
@@ -34,7 +36,8 @@ def delete_genre(instance, **kwargs):
 
 @receiver(post_save, sender="movies.Person")
 def save_person(instance, **kwargs):
-    touch_movies(instance.filmwork_set.all())
+    if settings.TOUCH_MOVIES_ON_RELATED_SAVE:
+        touch_movies(instance.filmwork_set.all())
 
 
 @receiver(pre_delete, sender="movies.Person")
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+
+import psycopg
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.exceptions import ConnectionError as ElasticConnectionError
+from elasticsearch.helpers import BulkIndexError, async_streaming_bulk
+from psycopg.rows import dict_row
+
+from backoff import CircuitOpenError, async_backoff, get_sleep_time
+from config_reader import config
+from etl import BaseEtl, GenresIndex, MoviesIndex, PersonsIndex
+from index_manager import get_mapping_drift
+from metrics import metrics
+from scheduling import IdlePoller
+from serializers import SERIALIZERS
+from state import StateStore
+
+logging.basicConfig(level=logging.INFO)
+
+
+class AsyncEtl(BaseEtl):
+    """Asyncio counterpart of `Etl`: many index pipelines share one event loop instead of a thread or process each"""
+
+    def __init__(
+        self,
+        index_name: str,
+        index_folder_path: Path = Path("index"),
+        state_store: Optional[StateStore] = None,
+    ) -> None:
+        """Initiate ETL process with config values"""
+        super().__init__(index_name, index_folder_path, state_store)
+        if self.extract_mode != "query":
+            logging.warning("Async ETL supports query extract mode only.")
+            self.extract_mode = "query"
+        self.pg: Optional[psycopg.AsyncConnection] = None
+        self.es = AsyncElasticsearch(
+            hosts=[config.elastic.elastic_host],
+            serializer=SERIALIZERS[config.elastic.serializer](),
+        )
+
+    async def run(self):
+        """Run extract -> transform -> load in a loop without blocking the event loop."""
+        logging.info("Replication of %s started.", self.index_name)
+        poller = IdlePoller(config.postgres.fetch_delay, config.postgres.max_idle_delay)
+        try:
+            while True:
+                try:
+                    await self._bootstrap_index()
+                    break
+                except (CircuitOpenError, ElasticConnectionError) as error:
+                    # Elasticsearch started along with the ETL may still be booting.
+                    logging.warning(
+                        "Startup of %s postponed: %r.", self.index_name, error
+                    )
+                    await asyncio.sleep(poller.next_delay(0))
+            while True:
+                started = time.perf_counter()
+                loaded = 0
+                try:
+                    async for extracted, checkpoint in self.extract():
+                        transformed = self.transform(extracted)
+                        await self.load(transformed)
+                        self._save_checkpoint(checkpoint)
+                        loaded += len(transformed)
+                except (psycopg.OperationalError, psycopg.InterfaceError):
+                    # The state was not advanced, next pass reconnects and resumes from it.
+                    logging.exception("PostgreSQL connection lost during extraction.")
+                    await self._close_connection()
+                except (CircuitOpenError, ElasticConnectionError) as error:
+                    logging.warning("Pass of %s skipped: %r.", self.index_name, error)
+                self.state.flush()
+                self._report_pass(loaded, time.perf_counter() - started)
+                delay = poller.next_delay(loaded)
+                metrics.observe("etl.sleep_seconds", delay)
+                await asyncio.sleep(delay)
+        finally:
+            self.state.flush(force=True)
+            await self._close_connection()
+            await self.es.close()
+
+    async def extract(
+        self,
+    ) -> AsyncGenerator[Tuple[List[Dict], Dict[str, str]], None]:
+        """Fetch data from PostgreSQL in keyset pages along with the state to save once a batch is loaded."""
+        cursor_value = self._get_last_cursor(self.cursor_fields)
+        while True:
+            fetched = 0
+            page_size = self._get_page_size()
+            pg_conn = await self._get_connection()
+            try:
+                async with pg_conn.cursor() as cursor:
+                    started = time.perf_counter()
+                    await cursor.execute(self._get_guery(), (*cursor_value, page_size))
+                    if config.postgres.adaptive_batching:
+                        batches = self._fetch_page(cursor, started)
+                    else:
+                        batches = self._fetch_batches(cursor)
+                    async for batch in batches:
+                        fetched += len(batch)
+                        cursor_value = self._get_cursor(batch[-1])
+                        yield batch, dict(zip(self.cursor_fields, cursor_value))
+            finally:
+                if not pg_conn.closed:
+                    await pg_conn.rollback()
+            if fetched < page_size:
+                break
+
+    async def _fetch_batches(self, cursor) -> AsyncGenerator[List[Dict], None]:
+        """Split cursor results into batches of `config.postgres.limit` rows."""
+        while True:
+            batch = await cursor.fetchmany(config.postgres.limit)
+            if not batch:
+                break
+            yield batch
+
+    async def _fetch_page(
+        self, cursor, started: float
+    ) -> AsyncGenerator[List[Dict], None]:
+        """Fetch a whole keyset page as one batch and adjust the next page size by the time it took."""
+        page = await cursor.fetchall()
+        elapsed = time.perf_counter() - started
+        metrics.observe("pg.fetch_seconds", elapsed)
+        if page:
+            metrics.gauge("pg.fetch_size", self.fetch_size.update(len(page), elapsed))
+            yield page
+
+    async def _get_connection(self) -> psycopg.AsyncConnection:
+        """Get the kept PostgreSQL connection, connecting if there is none."""
+        if self.pg is None or self.pg.closed:
+            with metrics.timer("pg.acquire_seconds"):
+                self.pg = await self._connect()
+        return self.pg
+
+    @async_backoff(exceptions=(psycopg.OperationalError,), breaker="postgres")
+    async def _connect(self) -> psycopg.AsyncConnection:
+        """Open PostgreSQL connection using a backoff."""
+        return await psycopg.AsyncConnection.connect(
+            **dict(config.postgres.dsn), row_factory=dict_row
+        )
+
+    async def _close_connection(self) -> None:
+        """Close and forget PostgreSQL connection."""
+        if self.pg is not None and not self.pg.closed:
+            await self.pg.close()
+        self.pg = None
+
+    async def load(self, transformed: List[Dict]):
+        """Insert data into ElasticSearch."""
+        if not transformed:
+            return
+        pending = transformed
+        for attempt in range(config.elastic.max_retries + 1):
+            if attempt:
+                metrics.incr("es.retried_docs", len(pending))
+                await asyncio.sleep(get_sleep_time(attempt - 1))
+            with metrics.timer("es.bulk_seconds"):
+                pending = await self._bulk(pending)
+            if not pending:
+                logging.info(
+                    "Batch of %s %s uploaded to elasticsearch.",
+                    len(transformed),
+                    self.index_name,
+                )
+                return
+        raise BulkIndexError(
+            f"{len(pending)} document(s) were still rejected after {config.elastic.max_retries} retries.",
+            pending,
+        )
+
+    @async_backoff(exceptions=(ElasticConnectionError,), breaker="elasticsearch")
+    async def _bootstrap_index(self) -> None:
+        """Create the index unless it exists and make sure its mapping did not drift, once on startup."""
+        if not await self.es.indices.exists(index=self.index_name):
+            await self.es.indices.create(
+                index=f"{self.index_name}_v1",
+                body={**self.index_body, "aliases": {self.index_name: {}}},
+                ignore=400,
+            )
+            return
+        live_mappings = await self.es.indices.get_mapping(index=self.index_name)
+        # Rebuilding is up to the sync engine: etl.py --reindex.
+        self._check_mapping(
+            get_mapping_drift(live_mappings, self.index_body), can_rebuild=False
+        )
+
+    @async_backoff(exceptions=(ElasticConnectionError,), breaker="elasticsearch")
+    async def _bulk(self, actions: List[Dict]) -> List[Dict]:
+        """Send actions in chunks and return the ones rejected with a retryable status."""
+        actions_by_id = {str(action["_id"]): action for action in actions}
+        chunk_size = self.chunk_size.size
+        started = time.perf_counter()
+        failures = [
+            item
+            async for ok, item in async_streaming_bulk(
+                self.es,
+                actions,
+                chunk_size=chunk_size,
+                max_chunk_bytes=config.elastic.max_chunk_bytes,
+                raise_on_error=False,
+            )
+            if not ok
+        ]
+        self._update_chunk_size(len(actions), chunk_size, time.perf_counter() - started)
+        return self._split_failures(failures, actions_by_id)
+
+
+class AsyncMovieEtl(MoviesIndex, AsyncEtl):
+    """Asynchronously replicate movies from PostgreSQL database to ElasticSearch index"""
+
+    def __init__(self, state_store: Optional[StateStore] = None) -> None:
+        """Specifies item name for generic async ETL"""
+        super().__init__(index_name="movies", state_store=state_store)
+
+
+class AsyncGenreEtl(GenresIndex, AsyncEtl):
+    """Asynchronously replicate genres from PostgreSQL database to ElasticSearch index"""
+
+    def __init__(self, state_store: Optional[StateStore] = None) -> None:
+        """Specifies item name for generic async ETL"""
+        super().__init__(index_name="genres", state_store=state_store)
+
+
+class AsyncPersonEtl(PersonsIndex, AsyncEtl):
+    """Asynchronously replicate persons from PostgreSQL database to ElasticSearch index"""
+
+    def __init__(self, state_store: Optional[StateStore] = None) -> None:
+        """Specifies item name for generic async ETL"""
+        super().__init__(index_name="persons", state_store=state_store)
+
+
+async def run_all(*etls: AsyncEtl) -> None:
+    """Run several index pipelines concurrently in the current event loop."""
+    await asyncio.gather(*(etl.run() for etl in etls))
+
+
+if __name__ == "__main__":
+    asyncio.run(run_all(AsyncMovieEtl(), AsyncGenreEtl(), AsyncPersonEtl()))
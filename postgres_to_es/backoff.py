@@ -1,59 +1,282 @@
-import datetime
+import asyncio
 import logging
+import random
+import threading
 import time
 from functools import wraps
+from typing import Dict, Optional, Tuple, Type
+
+from metrics import metrics
 
 logging.basicConfig(level=logging.INFO)
 
+JITTER_MODES = ("none", "full", "decorrelated")
+
+
+class CircuitOpenError(Exception):
+    """Сервис недавно был недоступен, вызов отклонён без обращения к нему"""
+
+
+def get_sleep_time(
+    n,
+    start_sleep_time=0.1,
+    factor=2,
+    border_sleep_time=10,
+    jitter="full",
+    previous_sleep_time=None,
+):
+    """Время ожидания перед повтором номер n.
+
+    Без разброса (none) время растёт экспоненциально до граничного. Полный разброс (full)
+    выбирает случайное время от нуля до экспоненциального, декоррелированный (decorrelated)
+    от начального до утроенного предыдущего. Разброс не даёт нескольким процессам
+    переподключаться одновременно.
+    """
+    time_interval = min(start_sleep_time * factor**n, border_sleep_time)
+    if jitter == "full":
+        return random.uniform(0, time_interval)
+    if jitter == "decorrelated":
+        upper = (previous_sleep_time or start_sleep_time) * 3
+        return min(border_sleep_time, random.uniform(start_sleep_time, upper))
+    return time_interval
+
+
+class CircuitBreaker:
+    """Размыкатель цепи: после `failure_threshold` вызовов подряд, исчерпавших свой срок повторов,
+    вызовы отклоняются сразу.
+
+    Ошибкой считается вызов целиком, а не отдельная попытка: пока не истёк срок повторов,
+    вызов ждёт сервис, например загружающийся при старте. Через `reset_timeout` секунд
+    пропускается один пробный вызов: успех замыкает цепь, ошибка размыкает её снова.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 1, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Можно ли обратиться к сервису сейчас"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self) -> None:
+        """Отметить ответ сервиса и замкнуть цепь"""
+        with self.lock:
+            if self.opened_at is not None:
+                logging.info("%s is available again.", self.name)
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self) -> None:
+        """Отметить вызов, исчерпавший срок повторов, и разомкнуть цепь, если их набралось достаточно или не удался пробный вызов"""
+        with self.lock:
+            self.failures += 1
+            if self.trial or (
+                self.opened_at is None and self.failures >= self.failure_threshold
+            ):
+                logging.warning(
+                    "%s is unavailable, failing fast for %s sec.",
+                    self.name,
+                    self.reset_timeout,
+                )
+                metrics.incr(f"circuit.{self.name}.opened")
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+# Общие размыкатели по именам сервисов: все вызовы одного сервиса видят его состояние.
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Получить общий размыкатель сервиса"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+class _Retry:
+    """Состояние повторов одного вызова: счётчик, крайний срок, размыкатель и метрики"""
+
+    def __init__(
+        self,
+        name,
+        start_sleep_time,
+        factor,
+        border_sleep_time,
+        timeout,
+        jitter,
+        breaker: Optional[str] = None,
+    ):
+        self.name = name
+        self.breaker = get_breaker(breaker) if breaker else None
+        self.start_sleep_time = start_sleep_time
+        self.factor = factor
+        self.border_sleep_time = border_sleep_time
+        self.timeout = timeout
+        self.jitter = jitter
+        self.deadline = time.monotonic() + timeout
+        self.n = 0
+        self.sleep_time = None
+
+    def next_sleep_time(self, error: Exception) -> float:
+        """Время ожидания перед следующим повтором, ошибка передаётся дальше и отмечается в размыкателе по истечении срока"""
+        self.sleep_time = get_sleep_time(
+            self.n,
+            self.start_sleep_time,
+            self.factor,
+            self.border_sleep_time,
+            self.jitter,
+            self.sleep_time,
+        )
+        if time.monotonic() + self.sleep_time > self.deadline:
+            logging.warning(
+                "Encountered error was not resolved in %s sec, raising...",
+                self.timeout,
+            )
+            metrics.incr(f"retry.{self.name}.giveups")
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise error
+        logging.info(
+            "%s failed with %r, retrying in %.2f sec...",
+            self.name,
+            error,
+            self.sleep_time,
+        )
+        metrics.incr(f"retry.{self.name}.retries")
+        metrics.observe(f"retry.{self.name}.wait_seconds", self.sleep_time)
+        self.n += 1
+        return self.sleep_time
+
+    def check_breaker(self) -> None:
+        """Отклонить вызов, пока цепь разомкнута"""
+        if self.breaker is not None and not self.breaker.allow():
+            metrics.incr(f"circuit.{self.breaker.name}.rejected")
+            raise CircuitOpenError(f"{self.breaker.name} is known to be down")
+
+    def record_success(self) -> None:
+        """Отметить ответ сервиса в размыкателе"""
+        if self.breaker is not None:
+            self.breaker.record_success()
+
 
 def backoff(
+    exceptions: Tuple[Type[Exception], ...],
     start_sleep_time=0.1,
     factor=2,
     border_sleep_time=10,
     timeout=60,
+    jitter="full",
+    breaker: Optional[str] = None,
 ):
     """
-    Функция для повторного выполнения функции через некоторое время, если возникла ошибка. Использует наивный экспоненциальный рост времени повтора (factor) до граничного времени ожидания (border_sleep_time)
+    Функция для повторного выполнения функции через некоторое время, если возникла ошибка. Использует экспоненциальный рост времени повтора (factor) до граничного времени ожидания (border_sleep_time) со случайным разбросом
 
     Формула:
         t = start_sleep_time * 2^(n) if t < border_sleep_time
         t = border_sleep_time if t >= border_sleep_time
+    :param exceptions: классы ошибок, при которых выполняется повтор, остальные передаются дальше сразу.
     :param start_sleep_time: начальное время повтора
     :param factor: во сколько раз нужно увеличить время ожидания
     :param border_sleep_time: граничное время ожидания
-    :param timeout: максимальное суммарное время ожидания в секундах, после которого ошибка будет передана дальше.
+    :param timeout: максимальное время в секундах с первого вызова, после которого ошибка будет передана дальше.
+    :param jitter: разброс времени ожидания: none, full или decorrelated.
+    :param breaker: имя сервиса, общий размыкатель которого отклоняет вызовы, пока сервис недоступен. Вызов, исчерпавший timeout, размыкает цепь.
     :return: результат выполнения функции
     """
-
-    def get_sleep_time(n):
-        time_interval = start_sleep_time * factor ** n
-        return (
-            border_sleep_time if time_interval >= border_sleep_time else time_interval
-        )
+    if jitter not in JITTER_MODES:
+        raise ValueError(f"Unknown jitter mode {jitter}.")
 
     def func_wrapper(func):
+        name = func.__qualname__
+
         @wraps(func)
         def inner(*args, **kwargs):
-            n = 0
-            total_sleep_time = 0
+            retry = _Retry(
+                name,
+                start_sleep_time,
+                factor,
+                border_sleep_time,
+                timeout,
+                jitter,
+                breaker,
+            )
+            retry.check_breaker()
+            while True:
+                try:
+                    result = func(*args, **kwargs)
+                except exceptions as error:
+                    time.sleep(retry.next_sleep_time(error))
+                except Exception:
+                    # Сервис ответил: ошибка не связана с его доступностью.
+                    retry.record_success()
+                    raise
+                else:
+                    retry.record_success()
+                    return result
+
+        return inner
+
+    return func_wrapper
+
+
+def async_backoff(
+    exceptions: Tuple[Type[Exception], ...],
+    start_sleep_time=0.1,
+    factor=2,
+    border_sleep_time=10,
+    timeout=60,
+    jitter="full",
+    breaker: Optional[str] = None,
+):
+    """
+    Асинхронный вариант `backoff` для корутин: ждёт повтора через asyncio.sleep, не блокируя цикл событий.
+    Параметры совпадают с `backoff`.
+    """
+    if jitter not in JITTER_MODES:
+        raise ValueError(f"Unknown jitter mode {jitter}.")
+
+    def func_wrapper(func):
+        name = func.__qualname__
+
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            retry = _Retry(
+                name,
+                start_sleep_time,
+                factor,
+                border_sleep_time,
+                timeout,
+                jitter,
+                breaker,
+            )
+            retry.check_breaker()
             while True:
                 try:
-                    return func(*args, **kwargs)
+                    result = await func(*args, **kwargs)
+                except exceptions as error:
+                    await asyncio.sleep(retry.next_sleep_time(error))
                 except Exception:
-                    if total_sleep_time > timeout:
-                        logging.warning(
-                            "Encountered error was not resolved in %s, raising...",
-                            str(timeout),
-                        )
-                        raise
-
-                    sleep_time = get_sleep_time(n)
-                    logging.info(
-                        "Oh no, an error! I guess I'll take a %s sec nap...", sleep_time
-                    )
-                    time.sleep(sleep_time)
-                    total_sleep_time += sleep_time
-                    n += 1
+                    # Сервис ответил: ошибка не связана с его доступностью.
+                    retry.record_success()
+                    raise
+                else:
+                    retry.record_success()
+                    return result
 
         return inner
 
@@ -0,0 +1,35 @@
+class AdaptiveBatchSize:
+    """Batch size that grows or shrinks to keep the measured cost of a batch close to a target.
+
+    The cost is whatever is being limited: seconds spent fetching or indexing a batch, or its size in bytes.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_size: int,
+        max_size: int,
+        target: float,
+        enabled: bool = True,
+        max_step: float = 2.0,
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target = target
+        self.enabled = enabled
+        self.max_step = max_step
+        self.size = initial if not enabled else self._bound(initial)
+
+    def _bound(self, size: float) -> int:
+        """Keep size within configured limits."""
+        return int(max(self.min_size, min(self.max_size, size)))
+
+    def update(self, items: int, cost: float) -> int:
+        """Account the cost of a batch of `items` and get the size for the next one."""
+        if not self.enabled or items <= 0 or cost <= 0:
+            return self.size
+        ideal = self.target * items / cost
+        # Change at most `max_step` times per batch, a single slow batch should not collapse the size.
+        ideal = max(self.size / self.max_step, min(self.size * self.max_step, ideal))
+        self.size = self._bound(ideal)
+        return self.size
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Literal
 from pydantic import BaseModel, FilePath
 
 
@@ -13,21 +13,70 @@ class DSNSettings(BaseModel):
 class PostgresSettings(BaseModel):
     dsn: DSNSettings
     limit: Optional[int]
+    page_size: int = 1000
+    extract_mode: Literal["query", "pipeline", "wal"] = "query"
+    replication_slot: str = "etl_movies"
+    producer_page_size: int = 1000
+    enrich_size: int = 100
+    adaptive_batching: bool = False
+    min_limit: int = 10
+    max_limit: int = 5000
+    target_fetch_seconds: float = 0.5
+    notify_channel: str = "film_work_changed"
     fetch_delay: Optional[float]
+    max_idle_delay: float = 30
+    server_side_cursor: bool = False
+    itersize: int = 2000
+    health_check_interval: float = 30
+    raw_documents: bool = False
 
 
 class Elastic(BaseModel):
     elastic_host: str
+    bulk_workers: int = 4
+    chunk_size: int = 500
+    max_chunk_bytes: int = 100 * 1024 * 1024
+    max_retries: int = 5
+    min_chunk_size: int = 50
+    max_chunk_size: int = 5000
+    target_bulk_seconds: float = 1.0
+    merge_timeout: float = 3600
+    serializer: Literal["json", "orjson"] = "json"
 
 
 class StateSettings(BaseModel):
+    backend: Literal["json", "sqlite", "postgres"] = "json"
     file_path: Optional[str]
+    table: str = "etl_state"
+    fsync: bool = False
+    flush_every: int = 1
+    flush_interval: Optional[float] = None
+
+
+class EtlSettings(BaseModel):
+    metrics_log_interval: float = 60
+    pipelined: bool = False
+    queue_size: int = 4
+    listen: bool = False
+    notify_window: float = 0.2
+    safety_poll_interval: float = 60
+    reconcile_interval: Optional[float] = 3600
+    reconcile_batch_size: int = 1000
+    reindex_workers: int = 1
+    bulk_profile_lag: Optional[float] = 3600
+    on_mapping_drift: Literal["fail", "reindex"] = "fail"
+    skip_unchanged: bool = False
+    partial_updates: bool = False
+    transform_workers: int = 0
+    transform_min_batch: int = 1000
+    digest_file_path: str = "digests.db"
 
 
 class Config(BaseModel):
     postgres: PostgresSettings
     elastic: Elastic
     state: StateSettings
+    etl: EtlSettings = EtlSettings()
 
 
 config = Config.parse_file("config.json")
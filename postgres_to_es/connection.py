@@ -0,0 +1,90 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import psycopg2
+from psycopg2.extensions import connection as PgConnection
+
+from backoff import backoff
+from metrics import metrics
+
+
+class PostgresConnection:
+    """Keep one health-checked PostgreSQL connection alive across ETL loops."""
+
+    def __init__(self, dsn: dict, health_check_interval: float = 30, **connect_kwargs):
+        self.dsn = dsn
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+        self.conn: Optional[PgConnection] = None
+        self._last_checked = 0.0
+
+    @contextmanager
+    def connection(self):
+        """Provide a live connection and end its transaction afterwards.
+
+        A connection that breaks while in use is dropped, so the next call reconnects through the backoff.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.invalidate()
+            raise
+        finally:
+            self._end_transaction(conn)
+
+    def acquire(self) -> PgConnection:
+        """Get the kept connection, reconnecting if it is closed or does not answer."""
+        with metrics.timer("pg.acquire_seconds"):
+            if not self._is_healthy():
+                if self.conn is not None:
+                    metrics.incr("pg.reconnects")
+                    logging.warning("PostgreSQL connection is broken, reconnecting...")
+                self.invalidate()
+                self.conn = self._connect()
+                self._last_checked = time.monotonic()
+        return self.conn
+
+    def _end_transaction(self, conn: PgConnection) -> None:
+        """Roll back whatever transaction the caller left open."""
+        if conn.closed:
+            return
+        try:
+            conn.rollback()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.invalidate()
+
+    def _is_healthy(self) -> bool:
+        """Check the connection state, pinging the server if it has been idle for too long."""
+        if self.conn is None or self.conn.closed:
+            return False
+        if time.monotonic() - self._last_checked < self.health_check_interval:
+            return True
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            self.conn.rollback()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+        self._last_checked = time.monotonic()
+        return True
+
+    @backoff(exceptions=(psycopg2.OperationalError,), breaker="postgres")
+    def _connect(self) -> PgConnection:
+        """Open a new PostgreSQL connection using a backoff."""
+        return psycopg2.connect(**self.dsn, **self.connect_kwargs)
+
+    def invalidate(self) -> None:
+        """Close and forget the current connection."""
+        if self.conn is not None and not self.conn.closed:
+            try:
+                self.conn.close()
+            except psycopg2.Error:
+                pass
+        self.conn = None
+
+    def close(self) -> None:
+        """Close the connection on shutdown."""
+        self.invalidate()
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import sqlite3
+from typing import Dict, Iterable, List
+
+# SQLite limits the number of query parameters, lookups are split into chunks.
+LOOKUP_CHUNK_SIZE = 500
+
+
+def get_digest(action: Dict) -> bytes:
+    """Get a stable digest of the document of an index action, metadata fields aside."""
+    if "_source" in action:
+        # A document encoded by PostgreSQL: jsonb text output has a fixed key order.
+        encoded = action["_source"].encode()
+    else:
+        document = {key: value for key, value in action.items() if key[0] != "_"}
+        encoded = json.dumps(
+            document,
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str,
+        ).encode()
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+
+def add_digests(actions: List[Dict]) -> None:
+    """Attach digests to index actions, they are taken off before the actions are sent."""
+    for action in actions:
+        if "_op_type" not in action:
+            action["_digest"] = get_digest(action)
+
+
+class DigestIndex:
+    """Digests of indexed documents by id kept in a local SQLite file, one table per pipeline.
+
+    Digests describe a single concrete index: they are dropped once the index is bound
+    to another one, a rebuilt index must receive every document again.
+    """
+
+    def __init__(self, file_path: str, name: str):
+        self.table = f"{name}_digests"
+        self.conn = sqlite3.connect(file_path, timeout=30)
+        with self.conn:
+            self.conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.table}" (id TEXT PRIMARY KEY, digest BLOB)'
+            )
+            self.conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.table}_index" (name TEXT)'
+            )
+
+    def bind(self, index: str) -> None:
+        """Make digests describe the given concrete index, dropping the ones of any other."""
+        with self.conn:
+            row = self.conn.execute(f'SELECT name FROM "{self.table}_index"').fetchone()
+            if row is not None and row[0] == index:
+                return
+            self.conn.execute(f'DELETE FROM "{self.table}"')
+            self.conn.execute(f'DELETE FROM "{self.table}_index"')
+            self.conn.execute(
+                f'INSERT INTO "{self.table}_index" (name) VALUES (?)', (index,)
+            )
+
+    def get_many(self, ids: List[str]) -> Dict[str, bytes]:
+        """Get stored digests of the given documents, unknown ones are left out."""
+        digests = {}
+        for position in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+            chunk = ids[position : position + LOOKUP_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            digests.update(
+                self.conn.execute(
+                    f'SELECT id, digest FROM "{self.table}" WHERE id IN ({placeholders})',
+                    chunk,
+                )
+            )
+        return digests
+
+    def save_many(self, digests: Dict[str, bytes]) -> None:
+        """Store digests of loaded documents in one transaction."""
+        with self.conn:
+            self.conn.executemany(
+                f'INSERT OR REPLACE INTO "{self.table}" (id, digest) VALUES (?, ?)',
+                digests.items(),
+            )
+
+    def delete_many(self, ids: Iterable[str]) -> None:
+        """Forget documents deleted from the index or changed there by other means."""
+        with self.conn:
+            self.conn.executemany(
+                f'DELETE FROM "{self.table}" WHERE id = ?', ((i,) for i in ids)
+            )
+
+    def close(self) -> None:
+        self.conn.close()
@@ -1,38 +1,196 @@
+import argparse
 import json
 import logging
 import time
 from abc import abstractmethod, ABC
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import closing
+from functools import lru_cache
+from datetime import datetime, timezone
+from itertools import islice, repeat
+from multiprocessing import get_context
 from pathlib import Path
-from typing import List, Generator, Dict, Tuple
+from typing import List, Generator, Dict, Tuple, Sequence, Optional
 
 import psycopg2
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.exceptions import ConnectionError as ElasticConnectionError
+from elasticsearch.exceptions import TransportError
+from elasticsearch.helpers import BulkIndexError
+from psycopg2.extensions import cursor as TupleCursor
 from psycopg2.extras import DictCursor, DictRow
 
-from backoff import backoff
+from backoff import CircuitOpenError, backoff, get_sleep_time
+from batching import AdaptiveBatchSize
 from config_reader import config
-from queries.movies_query import movies_query
-from state import State, JsonFileStorage
+from connection import PostgresConnection
+from digests import DigestIndex, add_digests
+from index_manager import (
+    LIVE_BULK_LOAD_SETTINGS,
+    MappingDriftError,
+    bootstrap_index,
+    create_version,
+    get_alias_indices,
+    get_serving_settings,
+    publish_version,
+)
+from metrics import metrics
+from notify import ChangeListener
+from pipeline import run_pipelined
+from replication import (
+    SLOT_LSN_QUERY,
+    Deleted,
+    Partial,
+    ReplicationSource,
+    TableChanges,
+    get_column,
+)
+from scheduling import IdlePoller
+from serializers import SERIALIZERS, encode_action
+from sharding import reindex_shard, split_id_range
+from queries.changed_film_works_query import (
+    changed_film_works_queries,
+    changed_film_works_watermark_queries,
+    film_work_genres_query,
+    film_work_persons_query,
+    film_works_by_genre_query,
+    film_works_by_person_query,
+)
+from queries.movies_query import (
+    existing_film_work_ids_query,
+    film_work_ids_query,
+    movies_by_ids_query,
+    movies_document_query,
+    movies_document_shard_query,
+    movies_documents_by_ids_query,
+    movies_query,
+    movies_shard_query,
+)
+from queries.genres_query import (
+    existing_genre_ids_query,
+    genre_ids_query,
+    genre_watermark_query,
+    genres_query,
+    genres_shard_query,
+)
+from queries.persons_query import (
+    existing_person_ids_query,
+    person_ids_query,
+    person_watermark_query,
+    persons_query,
+    persons_shard_query,
+)
+from reconcile import find_orphans, iter_index_ids
+from transform_pool import TransformPool
+from transformer import DOCUMENT_COLUMN, RowTransformer, load_enricher
+from state import (
+    BaseStorage,
+    JsonFileStorage,
+    PostgresStorage,
+    SqliteStorage,
+    StateStore,
+)
 
 logging.basicConfig(level=logging.INFO)
 
+# Too many requests and service unavailable: elasticsearch is overloaded, the document may be resent.
+RETRYABLE_STATUSES = {429, 503}
+
+
+def create_storage() -> BaseStorage:
+    """Create state storage of the configured backend."""
+    if config.state.backend == "sqlite":
+        return SqliteStorage(config.state.file_path, config.state.table)
+    if config.state.backend == "postgres":
+        # A connection of its own: committing the state must not end an extraction transaction.
+        return PostgresStorage(
+            PostgresConnection(dict(config.postgres.dsn)), config.state.table
+        )
+    return JsonFileStorage(config.state.file_path, fsync=config.state.fsync)
+
+
+@lru_cache(maxsize=None)
+def get_state_store() -> StateStore:
+    """Get state store shared by all pipelines of the process."""
+    return StateStore(
+        create_storage(),
+        flush_every=config.state.flush_every,
+        flush_interval=config.state.flush_interval,
+        # State files written before namespacing belong to the movies pipeline.
+        legacy_namespace="movies",
+    )
 
-class Etl(ABC):
-    """General Etl class for item replication from PostgreSQL database to ElasticSearch index"""
+
+class BaseEtl(ABC):
+    """Index definition, queries, state and transformation shared by sync and async ETL engines"""
+
+    # Source table holding indexed items, its deletions are propagated to the index.
+    item_table: Optional[str] = None
+    # Extract modes the index provides queries for.
+    extract_modes: Tuple[str, ...] = ("query",)
+    # `module.function` path of a function refining every built index action, e.g. normalising
+    # titles or adding synonyms. Transform pool workers import it by the path as well.
+    enricher: Optional[str] = None
+    # Trigger function notifying about changed items on `postgres.notify_channel` in push mode.
+    notify_function: Optional[str] = None
 
     def __init__(
-        self, index_name: str, index_folder_path: Path = Path("index")
+        self,
+        index_name: str,
+        index_folder_path: Path = Path("index"),
+        state_store: Optional[StateStore] = None,
     ) -> None:
         """Initiate ETL process with config values"""
         self.json_date_format = "%Y-%m-%dT%H:%M:%S.%f%z"
         self.index_name = index_name
         self.index_body = self._read_index_body(index_folder_path)
+        self.fields = tuple(self.index_body["mappings"]["properties"])
+        # Compiled from columns of the item query once its first rows are read, tuple rows only.
+        self.row_transformer: Optional[RowTransformer] = None
+        # Index documents are written to, a new index version while it is rebuilt.
+        self.target_index = index_name
+        # Digests of indexed documents, unchanged ones are not sent again.
+        self.digests: Optional[DigestIndex] = None
+
+        # Keyset pagination cursor, both fields are persisted in the state.
+        self.cursor_fields = ("updated_at", "id")
 
-        self.order_field = self.state_field = "updated_at"
+        # Pipelines of one process share a single storage, each in its own namespace.
+        self.state = (state_store or get_state_store()).namespace(index_name)
+        if config.postgres.extract_mode in self.extract_modes:
+            self.extract_mode = config.postgres.extract_mode
+        else:
+            logging.warning(
+                "%s ETL does not support %s extract mode, using query mode.",
+                index_name,
+                config.postgres.extract_mode,
+            )
+            self.extract_mode = "query"
 
-        self.state = State(JsonFileStorage(config.state.file_path))
-        self.es = Elasticsearch(hosts=[config.elastic.elastic_host])
+        # With adaptive batching a keyset page is loaded as a single batch, its size
+        # as well as enrich and bulk chunk sizes follow the measured latency.
+        self.fetch_size = AdaptiveBatchSize(
+            config.postgres.limit,
+            config.postgres.min_limit,
+            config.postgres.max_limit,
+            config.postgres.target_fetch_seconds,
+            enabled=config.postgres.adaptive_batching,
+        )
+        self.enrich_size = AdaptiveBatchSize(
+            config.postgres.enrich_size,
+            config.postgres.min_limit,
+            config.postgres.max_limit,
+            config.postgres.target_fetch_seconds,
+            enabled=config.postgres.adaptive_batching,
+        )
+        self.chunk_size = AdaptiveBatchSize(
+            config.elastic.chunk_size,
+            config.elastic.min_chunk_size,
+            config.elastic.max_chunk_size,
+            config.elastic.target_bulk_seconds,
+            enabled=config.postgres.adaptive_batching,
+        )
 
     def _read_index_body(self, index_folder_path: Path):
         """Get index body from file."""
@@ -40,95 +198,1097 @@ class Etl(ABC):
         with open(path, "r") as file:
             return json.load(file)
 
-    def run(self):
-        """Run extract -> transform -> load in a loop."""
-        logging.info("Replication started.")
-        while True:
-            for extracted in self.extract():
-                transformed, last_item_time = self.transform(extracted)
-                self.load(transformed)
-                self.state.set_state(self.state_field, last_item_time)
-                time.sleep(config.postgres.fetch_delay)
-
-    def extract(self) -> Generator[List[DictRow], None, None]:
-        """Fetch queries data from PostgreSQL in batches"""
-        update_time = self._get_last_update_time()
-        pg_conn = self.get_connection()
-        with pg_conn.cursor() as cursor:
-            # When we update genre or a person `updated_at` column of related queries gets a new value.
-            # This allows us to fetch everything we need using the same query.
-            # See signals.py in Django application for reference.
-            cursor.execute(self._get_guery(), (update_time,))
-            while True:
-                batch = cursor.fetchmany(config.postgres.limit)
-                if not batch:
-                    break
-                yield batch
-        cursor.close()
-
     @abstractmethod
     def _get_guery(self):
         """Load PostgreSQL query from file or use 'cached' one."""
         pass
 
-    def _get_last_update_time(self, default_value: str = "2000-01-01T00:00:00.000000"):
-        """Fetch last updated time from config to start up from"""
-        return self.state.get_state(self.state_field) or default_value
+    def _get_changed_queries(self) -> Dict[str, str]:
+        """Get producer queries returning ids of changed items, keyed by source table."""
+        raise NotImplementedError(
+            f"{self.index_name} ETL does not support pipeline mode"
+        )
 
-    @backoff()
-    def get_connection(self):
-        """Obtain PostgreSQL database connection using a backoff."""
-        return psycopg2.connect(**dict(config.postgres.dsn), cursor_factory=DictCursor)
+    def _get_enrich_query(self) -> str:
+        """Get query aggregating items by an array of ids."""
+        raise NotImplementedError(
+            f"{self.index_name} ETL does not support pipeline mode"
+        )
 
-    def transform(self, extract: List[DictRow]) -> Tuple[List[Dict], str]:
-        """Prepare data for loading into ElasticSearch and get last item's updated_at time."""
-        last_item_time = self._get_update_time(extract[-1])
-        transformed = [self._transform_item(row) for row in extract]
-        return transformed, last_item_time
+    def _get_partial_queries(self) -> Dict[str, str]:
+        """Get queries aggregating only the fields a source table affects by an array of item ids, keyed by source."""
+        return {}
+
+    def _get_ids_query(self) -> str:
+        """Get query returning ids of all source items as text in ascending order."""
+        raise NotImplementedError(
+            f"{self.index_name} ETL does not support deletion reconciliation"
+        )
+
+    def _get_existing_ids_query(self) -> str:
+        """Get query returning those of an array of ids which still exist in the source."""
+        raise NotImplementedError(
+            f"{self.index_name} ETL does not support deletion reconciliation"
+        )
+
+    def _get_change_tables(self) -> Dict[str, TableChanges]:
+        """Get source tables whose row changes affect indexed items, for change data capture."""
+        raise NotImplementedError(
+            f"{self.index_name} ETL does not support change data capture"
+        )
+
+    def _get_shard_query(self) -> str:
+        """Get query aggregating a keyset page of items of an (after, upto] id range, ordered by id."""
+        raise NotImplementedError(f"{self.index_name} ETL does not support sharding")
+
+    def _get_watermark_queries(self) -> Dict[str, str]:
+        """Get queries returning the latest (updated_at, id) of a source, keyed by state field prefix."""
+        raise NotImplementedError(f"{self.index_name} ETL does not support sharding")
+
+    def _provides(self, *getters: str) -> bool:
+        """Tell whether the index overrides the given optional query getters of the base class."""
+        return self.item_table is not None and all(
+            getattr(type(self), getter) is not getattr(BaseEtl, getter)
+            for getter in getters
+        )
+
+    def _get_last_cursor(
+        self,
+        fields: Sequence[str],
+        default_value: Tuple[str, str] = (
+            "2000-01-01T00:00:00.000000",
+            "00000000-0000-0000-0000-000000000000",
+        ),
+    ) -> Tuple[str, str]:
+        """Fetch last (updated_at, id) pair from state to start up from"""
+        return tuple(
+            self.state.get_state(field) or default
+            for field, default in zip(fields, default_value)
+        )
+
+    def transform(self, extract: List[DictRow]) -> List[Dict]:
+        """Prepare data for loading into ElasticSearch."""
+        with metrics.timer("etl.transform_seconds"):
+            transformed = [self._transform_item(row) for row in extract]
+            if self.digests is not None:
+                add_digests(transformed)
+            return transformed
 
     def _transform_item(self, row: DictRow):
-        """Convert DictRow into ElasticSearch consumable dictionary."""
-        item_dict = dict(row)
-        result = {
-            "_index": self.index_name,
-            **{
-                k: item_dict[k]
-                for k in self.index_body["mappings"]["properties"].keys()
-            },
-        }
-        result["_id"] = result.pop("id")
+        """Convert a row into ElasticSearch consumable dictionary."""
+        if isinstance(row, Deleted):
+            return {"_op_type": "delete", "_index": self.target_index, "_id": row.id}
+        if isinstance(row, Partial):
+            return {
+                "_op_type": "update",
+                "_index": self.target_index,
+                "_id": row.id,
+                "doc": row.doc,
+            }
+        if self.row_transformer is not None:
+            return self.row_transformer.transform(row, self.target_index)
+        if DOCUMENT_COLUMN in row:
+            result = {
+                "_index": self.target_index,
+                "_id": row["id"],
+                "_source": row[DOCUMENT_COLUMN],
+            }
+        else:
+            result = {"_index": self.target_index, **{k: row[k] for k in self.fields}}
+            # `id` stays in the document too: it is mapped and used for sorted id scans.
+            result["_id"] = result["id"]
+        if self.enricher is not None:
+            result = load_enricher(self.enricher)(result)
         return result
 
-    def _get_update_time(self, last_item: DictRow) -> str:
-        """Get `updated_at` of the item in the format of a json-consumable string"""
-        last_datetime = dict(last_item)[self.order_field]
-        return last_datetime.strftime(self.json_date_format)
+    def _compile_transformer(self, description) -> None:
+        """Compile the row transformer for columns of an item query, unless they are known already."""
+        columns = tuple(column.name for column in description)
+        if self.row_transformer is None or self.row_transformer.columns != columns:
+            self.row_transformer = RowTransformer(self.fields, columns, self.enricher)
+
+    def _get_cursor(self, last_item: DictRow) -> Tuple[str, str]:
+        """Get (`updated_at`, `id`) of the item as json-consumable strings"""
+        return (
+            last_item["updated_at"].strftime(self.json_date_format),
+            str(last_item["id"]),
+        )
+
+    def _get_row_cursor(self, row: Tuple) -> Tuple[str, str]:
+        """Get (`updated_at`, `id`) of a tuple item row as json-consumable strings"""
+        return (
+            row[self.row_transformer.updated_at_position].strftime(
+                self.json_date_format
+            ),
+            str(row[self.row_transformer.id_position]),
+        )
+
+    def _save_checkpoint(self, checkpoint: Dict[str, str]) -> None:
+        """Save state of a loaded batch and report how far it lags behind the source."""
+        self.state.update(checkpoint)
+        for key, lag in self._get_lags(checkpoint).items():
+            metrics.gauge(f"etl.lag_seconds.{key}", lag)
+
+    def _get_lags(self, checkpoint: Dict[str, str]) -> Dict[str, float]:
+        """Get how many seconds behind the source every timestamp of a checkpoint is."""
+        now = datetime.now(timezone.utc)
+        return {
+            key: (now - datetime.strptime(value, self.json_date_format)).total_seconds()
+            for key, value in checkpoint.items()
+            if key.endswith("updated_at")
+        }
+
+    def _report_pass(self, loaded: int, elapsed: float) -> None:
+        """Report documents loaded by a replication pass and its drain rate."""
+        metrics.incr("etl.loaded_docs", loaded)
+        if loaded and elapsed > 0:
+            metrics.gauge("etl.drain_rate", loaded / elapsed)
+            logging.info(
+                "Pass loaded %s %s in %.2f sec.", loaded, self.index_name, elapsed
+            )
+
+    def _check_mapping(self, drifted: List[str], can_rebuild: bool) -> bool:
+        """Tell whether the index has to be rebuilt because of mapping drift, raise if it must not be used."""
+        if not drifted:
+            return False
+        message = f"Mapping of {', '.join(drifted)} differs from {self.index_name}.json"
+        if config.etl.on_mapping_drift == "reindex" and can_rebuild:
+            logging.warning("%s, rebuilding the index.", message)
+            return True
+        raise MappingDriftError(message)
+
+    def _get_page_size(self) -> int:
+        """Get the number of rows to read with the next keyset page."""
+        if config.postgres.adaptive_batching:
+            return self.fetch_size.size
+        return config.postgres.page_size
+
+    def _update_chunk_size(self, actions: int, chunk_size: int, elapsed: float):
+        """Adjust bulk chunk size by the estimated latency of a single bulk request."""
+        chunks = -(-actions // chunk_size)
+        rounds = -(-chunks // max(config.elastic.bulk_workers, 1))
+        metrics.gauge(
+            "es.chunk_size",
+            self.chunk_size.update(min(actions, chunk_size), elapsed / rounds),
+        )
+
+    def _split_failures(
+        self, failures: List[Dict], actions_by_id: Dict[str, Dict]
+    ) -> List[Dict]:
+        """Get actions of documents rejected with a retryable status, raise if any other document failed."""
+        rejected, errors = [], []
+        for item in failures:
+            op_type, info = next(iter(item.items()))
+            if op_type in ("delete", "update") and info.get("status") == 404:
+                # Already gone from the index, or not there yet: the full document follows then.
+                continue
+            if info.get("status") in RETRYABLE_STATUSES:
+                rejected.append(actions_by_id[info["_id"]])
+            else:
+                errors.append(item)
+        if errors:
+            raise BulkIndexError(f"{len(errors)} document(s) failed to index.", errors)
+        return rejected
+
+
+class Etl(BaseEtl):
+    """General Etl class for item replication from PostgreSQL database to ElasticSearch index"""
+
+    def __init__(
+        self,
+        index_name: str,
+        index_folder_path: Path = Path("index"),
+        state_store: Optional[StateStore] = None,
+    ) -> None:
+        """Initiate ETL process with config values"""
+        super().__init__(index_name, index_folder_path, state_store)
+        self.pg = PostgresConnection(
+            dict(config.postgres.dsn),
+            health_check_interval=config.postgres.health_check_interval,
+            cursor_factory=DictCursor,
+        )
+        self.serializer = SERIALIZERS[config.elastic.serializer]()
+        self.es = Elasticsearch(
+            hosts=[config.elastic.elastic_host], serializer=self.serializer
+        )
+        self.replication = (
+            ReplicationSource(
+                dict(config.postgres.dsn),
+                config.postgres.replication_slot,
+                [f"content.{table}" for table in self._get_change_tables()],
+            )
+            if self.extract_mode == "wal"
+            else None
+        )
+        if config.etl.skip_unchanged:
+            self.digests = DigestIndex(config.etl.digest_file_path, index_name)
+        # Started by `run`, so reindex workers never start processes of their own.
+        self.transform_pool: Optional[TransformPool] = None
+        # The first reconciliation runs one interval after startup, not on the first pass.
+        self._reconciled_at = time.monotonic()
+        self.listener = (
+            ChangeListener(
+                dict(config.postgres.dsn),
+                config.postgres.notify_channel,
+                self.notify_function,
+            )
+            # Notified ids are loaded with the by-ids query of the pipeline mode.
+            if config.etl.listen and "pipeline" in self.extract_modes
+            else None
+        )
+
+    def run(self, reindex: bool = False):
+        """Run extract -> transform -> load in a loop, rebuilding the index first if asked to."""
+        logging.info("Replication started.")
+        poller = IdlePoller(config.postgres.fetch_delay, config.postgres.max_idle_delay)
+        if config.etl.transform_workers > 0:
+            self.transform_pool = TransformPool(config.etl.transform_workers)
+        try:
+            while True:
+                try:
+                    self._start(reindex)
+                    break
+                except (
+                    CircuitOpenError,
+                    ElasticConnectionError,
+                    psycopg2.OperationalError,
+                    psycopg2.InterfaceError,
+                ) as error:
+                    # Services started along with the ETL may still be booting.
+                    logging.warning("Startup postponed: %r.", error)
+                    time.sleep(poller.next_delay(0))
+            while True:
+                started = time.perf_counter()
+                loaded = 0
+                try:
+                    loaded = self._run_pass()
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    # The state was not advanced, next pass reconnects and resumes from it.
+                    logging.exception("PostgreSQL connection lost during extraction.")
+                except (CircuitOpenError, ElasticConnectionError) as error:
+                    # Loaded batches are checkpointed, next pass resumes after them.
+                    logging.warning("Pass skipped: %r.", error)
+                self.state.flush()
+                self._report_pass(loaded, time.perf_counter() - started)
+                if self._reconcile_due():
+                    self._reconcile()
+                if self.listener is None:
+                    delay = poller.next_delay(loaded)
+                    time.sleep(delay)
+                else:
+                    # Polling is only a safety net for notifications lost while disconnected.
+                    delay = config.etl.safety_poll_interval if not loaded else 0
+                    self._listen(delay)
+                metrics.observe("etl.sleep_seconds", delay)
+                metrics.log_every(config.etl.metrics_log_interval)
+        finally:
+            self.state.flush(force=True)
+            self.pg.close()
+            if self.listener is not None:
+                self.listener.close()
+            if self.replication is not None:
+                self.replication.close()
+            if self.digests is not None:
+                self.digests.close()
+            if self.transform_pool is not None:
+                self.transform_pool.close()
+
+    def _start(self, reindex: bool) -> None:
+        """Prepare the index before replicating, rebuilding it if asked to or its mapping drifted."""
+        if self.state.get_saved_state("bulk_profile"):
+            # A previous run was stopped while loading a backlog.
+            self._leave_bulk_profile()
+        reindex = self._bootstrap_index() or reindex
+        if reindex or self._needs_full_load():
+            self.full_reindex(max(1, config.etl.reindex_workers))
+
+    @backoff(exceptions=(ElasticConnectionError,), breaker="elasticsearch")
+    def _bootstrap_index(self) -> bool:
+        """Create the index unless it exists and tell whether its mapping drifted, once on startup."""
+        drifted = bootstrap_index(self.es, self.index_name, self.index_body)
+        if self.digests is not None:
+            live = get_alias_indices(self.es, self.index_name) or [self.index_name]
+            self.digests.bind(",".join(sorted(live)))
+        return self._check_mapping(drifted, can_rebuild=self._can_reindex())
+
+    def _is_cold_start(self) -> bool:
+        """Tell whether the pipeline has never saved a position to resume from."""
+        if self.extract_mode == "wal":
+            fields = ["lsn"]
+        elif self.extract_mode == "pipeline":
+            fields = [f"{source}.updated_at" for source in self._get_changed_queries()]
+        else:
+            fields = ["updated_at"]
+        return all(self.state.get_saved_state(field) is None for field in fields)
+
+    def _can_reindex(self) -> bool:
+        """Tell whether the index provides the queries a full reindex reads with."""
+        return self._provides("_get_shard_query", "_get_watermark_queries")
+
+    def _needs_full_load(self) -> bool:
+        """Tell whether existing items have to be loaded before replicating changes.
+
+        A replication slot only holds changes made after it was created, so a cold start
+        in wal mode always loads the whole source, whatever the number of workers.
+        """
+        if not self._is_cold_start() or not self._can_reindex():
+            return False
+        return self.extract_mode == "wal" or config.etl.reindex_workers > 1
+
+    def full_reindex(self, workers: int) -> None:
+        """Build a new index version with `workers` processes, each one reading its own id range.
+
+        The index name is an alias switched to the new version once it is loaded, searches
+        keep hitting the previous one meanwhile. Positions polling resumes from are taken
+        before any range is read: items changed meanwhile are loaded again by the incremental
+        passes, none of them are lost. The state is saved only once the alias is switched,
+        so a failed reindex starts over.
+        """
+        if self.replication is not None:
+            # The slot must exist before the reindex starts to retain changes made during it.
+            self.replication.ensure_slot()
+        checkpoint = self._get_watermark()
+        index = create_version(self.es, self.index_name, self.index_body)
+        if self.digests is not None:
+            self.digests.bind(index)
+        logging.info(
+            "Full reindex of %s into %s with %s workers.",
+            self.index_name,
+            index,
+            workers,
+        )
+        started = time.perf_counter()
+        if workers > 1:
+            # Spawned workers open connections of their own instead of sharing inherited sockets.
+            with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as pool:
+                after, upto = zip(*split_id_range(workers))
+                loaded = sum(
+                    pool.map(
+                        reindex_shard, repeat(type(self)), repeat(index), after, upto
+                    )
+                )
+        else:
+            self.target_index = index
+            try:
+                loaded = self.load_shard(None, None)
+            finally:
+                self.target_index = self.index_name
+        with metrics.timer("es.publish_seconds"):
+            publish_version(
+                self.es,
+                self.index_name,
+                index,
+                self.index_body,
+                config.elastic.merge_timeout,
+            )
+        logging.info("Alias %s switched to %s.", self.index_name, index)
+        self.state.update(checkpoint)
+        self.state.flush(force=True)
+        self._report_pass(loaded, time.perf_counter() - started)
+
+    def _get_watermark(self) -> Dict[str, str]:
+        """Get the latest keyset position of every source polled in the current extract mode."""
+        if self.extract_mode == "pipeline":
+            prefixes = {
+                source: f"{source}." for source in self._get_watermark_queries()
+            }
+        elif self.extract_mode == "query":
+            prefixes = {self.item_table: ""}
+        else:
+            # Replication resumes from where the slot was, changes made since are read again.
+            with self.pg.connection() as pg_conn, pg_conn.cursor() as cursor:
+                cursor.execute(SLOT_LSN_QUERY, (config.postgres.replication_slot,))
+                return {"lsn": int(cursor.fetchone()[0])}
+        checkpoint = {}
+        queries = self._get_watermark_queries()
+        with self.pg.connection() as pg_conn, pg_conn.cursor() as cursor:
+            for source, prefix in prefixes.items():
+                cursor.execute(queries[source])
+                row = cursor.fetchone()
+                if row is not None:
+                    fields = (f"{prefix}{field}" for field in self.cursor_fields)
+                    checkpoint.update(zip(fields, self._get_cursor(row)))
+        return checkpoint
+
+    def load_shard(self, after: Optional[str], upto: Optional[str]) -> int:
+        """Load items of the (after, upto] id range in keyset pages and get the number of loaded documents."""
+        loaded = 0
+        page_size = config.postgres.page_size
+        while True:
+            with self.pg.connection() as pg_conn, pg_conn.cursor(
+                cursor_factory=TupleCursor
+            ) as cursor:
+                cursor.execute(
+                    self._get_shard_query(),
+                    {"after": after, "upto": upto, "limit": page_size},
+                )
+                rows = cursor.fetchall()
+                self._compile_transformer(cursor.description)
+            self.load(self.transform(rows))
+            loaded += len(rows)
+            if len(rows) < page_size:
+                return loaded
+            id_position = self.row_transformer.id_position
+            after = max(str(row[id_position]) for row in rows)
+
+    def transform(self, extract: List) -> List[Dict]:
+        """Prepare data for loading into ElasticSearch, in worker processes for large batches of item rows.
+
+        Small batches are transformed in-process, shipping them would cost more than it saves.
+        """
+        if (
+            self.transform_pool is None
+            or len(extract) < config.etl.transform_min_batch
+            # Item rows are plain tuples, deleted and partial items are named tuples.
+            or type(extract[0]) is not tuple
+        ):
+            return super().transform(extract)
+        with metrics.timer("etl.transform_seconds"):
+            return self.transform_pool.transform(
+                self.row_transformer,
+                self.target_index,
+                extract,
+                self.digests is not None,
+            )
+
+    def _reconcile_due(self) -> bool:
+        """Tell whether it is time for a periodic deletion reconciliation, if the index provides its queries."""
+        interval = config.etl.reconcile_interval
+        return (
+            interval is not None
+            and self._provides("_get_ids_query", "_get_existing_ids_query")
+            and time.monotonic() - self._reconciled_at >= interval
+        )
+
+    def _reconcile(self) -> None:
+        """Delete indexed documents whose items are gone from the source.
+
+        Sorted id streams of the source table and the index are merged, so memory stays bounded
+        regardless of catalog size. Candidates are re-checked before deletion, an item created
+        while the streams were read must not be removed.
+        """
+        deleted = 0
+        batch_size = config.etl.reconcile_batch_size
+        try:
+            with metrics.timer(
+                "etl.reconcile_seconds"
+            ), self.pg.connection() as pg_conn:
+                with pg_conn.cursor(name=f"{self.index_name}_reconcile") as cursor:
+                    cursor.itersize = config.postgres.itersize
+                    cursor.execute(self._get_ids_query())
+                    orphans = find_orphans(
+                        (row["id"] for row in cursor),
+                        iter_index_ids(self.es, self.index_name, batch_size),
+                    )
+                    while True:
+                        candidates = list(islice(orphans, batch_size))
+                        if not candidates:
+                            break
+                        with pg_conn.cursor() as check_cursor:
+                            check_cursor.execute(
+                                self._get_existing_ids_query(), (candidates,)
+                            )
+                            existing = {row["id"] for row in check_cursor}
+                        orphan_ids = [i for i in candidates if i not in existing]
+                        self.load(self.transform([Deleted(i) for i in orphan_ids]))
+                        deleted += len(orphan_ids)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            logging.exception("PostgreSQL connection lost during reconciliation.")
+            return
+        except (CircuitOpenError, ElasticConnectionError) as error:
+            logging.warning("Reconciliation skipped: %r.", error)
+            return
+        self._reconciled_at = time.monotonic()
+        metrics.incr("etl.reconciled_deletes", deleted)
+        logging.info("Reconciliation removed %s orphaned %s.", deleted, self.index_name)
+
+    def _listen(self, duration: float) -> None:
+        """Re-index items reported by database notifications for `duration` seconds."""
+        deadline = time.monotonic() + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            item_ids = self.listener.collect(
+                max(remaining, 0), config.etl.notify_window, config.postgres.max_limit
+            )
+            if item_ids:
+                try:
+                    with metrics.timer("etl.push_seconds"):
+                        self._load_ids(item_ids)
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    logging.exception("PostgreSQL connection lost during enrichment.")
+                except (CircuitOpenError, ElasticConnectionError) as error:
+                    logging.warning("Notified items skipped: %r.", error)
+            elif remaining <= 0:
+                return
+
+    def _load_ids(self, item_ids: List[str]) -> None:
+        """Enrich and load the given items right away, without touching the polling state.
+
+        Notified ids come in no keyset order, so the polling cursor cannot move past them:
+        the next safety poll loads these items again, unless `etl.skip_unchanged` drops them.
+        """
+        for position in range(0, len(item_ids), config.postgres.enrich_size):
+            rows = self._enrich(
+                item_ids[position : position + config.postgres.enrich_size]
+            )
+            self.load(self.transform(rows))
+
+    def _run_pass(self) -> int:
+        """Replicate everything changed since the saved state and get the number of loaded documents.
+
+        In pipelined mode extract, transform and load work concurrently on different batches.
+        Either way batches are loaded in extraction order and a checkpoint is saved only after
+        ElasticSearch acknowledged its batch, so the state never runs ahead of the index.
+        A large backlog is loaded with the bulk load profile of the index until the pass is over.
+        """
+        backlog = self._is_cold_start()
+        if config.etl.pipelined:
+            batches = run_pipelined(
+                self.extract(), [self.transform], config.etl.queue_size
+            )
+        else:
+            batches = (
+                (self.transform(extracted), checkpoint)
+                for extracted, checkpoint in self.extract()
+            )
+        loaded = 0
+        with closing(batches):
+            for transformed, checkpoint in batches:
+                self.load(transformed)
+                self._save_checkpoint(checkpoint)
+                loaded += len(transformed)
+                if backlog or self._is_lagging(checkpoint):
+                    backlog = True
+                    self._enter_bulk_profile()
+        if self.state.get_state("bulk_profile"):
+            self._leave_bulk_profile()
+        return loaded
+
+    def _is_lagging(self, checkpoint: Dict[str, str]) -> bool:
+        """Tell whether a loaded batch is far enough behind the source to load the rest in bulk."""
+        threshold = config.etl.bulk_profile_lag
+        return threshold is not None and any(
+            lag > threshold for lag in self._get_lags(checkpoint).values()
+        )
+
+    @backoff(exceptions=(ElasticConnectionError,), breaker="elasticsearch")
+    def _enter_bulk_profile(self) -> None:
+        """Switch the index to bulk load settings, marking it in the state beforehand.
+
+        Whichever run finds the mark restores the serving settings, even after a crash.
+        """
+        if self.state.get_state("bulk_profile"):
+            return
+        self.state.set_state("bulk_profile", True)
+        self.state.flush(force=True)
+        self.es.indices.put_settings(
+            index=self.index_name, body=LIVE_BULK_LOAD_SETTINGS
+        )
+        logging.info("Backlog of %s is loaded with bulk settings.", self.index_name)
+
+    @backoff(exceptions=(ElasticConnectionError,), breaker="elasticsearch")
+    def _leave_bulk_profile(self) -> None:
+        """Restore serving settings of the index and make the loaded documents searchable."""
+        self.es.indices.put_settings(
+            index=self.index_name, body=get_serving_settings(self.index_body)
+        )
+        self.es.indices.refresh(index=self.index_name)
+        self.state.set_state("bulk_profile", None)
+        self.state.flush(force=True)
+        logging.info("Serving settings of %s restored.", self.index_name)
+
+    def extract(self) -> Generator[Tuple[List[DictRow], Dict[str, str]], None, None]:
+        """Fetch queries data from PostgreSQL in batches along with the state to save once a batch is loaded."""
+        if self.extract_mode == "pipeline":
+            yield from self._extract_changed()
+        elif self.extract_mode == "wal":
+            yield from self._extract_replicated()
+        else:
+            yield from self._extract_query()
+
+    def _extract_query(
+        self,
+    ) -> Generator[Tuple[List[DictRow], Dict[str, str]], None, None]:
+        """Fetch and aggregate changed items with a single query.
+
+        Rows are read in keyset pages ordered by (updated_at, id), so rows sharing the same `updated_at`
+        are never lost at a page or batch boundary.
+        """
+        cursor_value = self._get_last_cursor(self.cursor_fields)
+        while True:
+            fetched = 0
+            page_size = self._get_page_size()
+            # The connection is kept between passes, its transaction is ended once the page is read.
+            with self.pg.connection() as pg_conn, self._open_cursor(pg_conn) as cursor:
+                # When we update genre or a person `updated_at` column of related queries gets a new value.
+                # This allows us to fetch everything we need using the same query.
+                # See signals.py in Django application for reference.
+                started = time.perf_counter()
+                cursor.execute(self._get_guery(), (*cursor_value, page_size))
+                if config.postgres.adaptive_batching:
+                    batches = self._fetch_page(cursor, started)
+                else:
+                    batches = self._fetch_batches(cursor)
+                for batch in batches:
+                    # A named cursor describes its columns once rows are fetched.
+                    self._compile_transformer(cursor.description)
+                    fetched += len(batch)
+                    cursor_value = self._get_row_cursor(batch[-1])
+                    yield batch, dict(zip(self.cursor_fields, cursor_value))
+            if fetched < page_size:
+                break
+
+    def _extract_changed(
+        self,
+    ) -> Generator[Tuple[List[DictRow], Dict[str, str]], None, None]:
+        """Two-phase extraction: collect ids of changed items per source table, then enrich them in bounded batches."""
+        for source, query in self._get_changed_queries().items():
+            yield from self._extract_source(source, query)
+
+    def _extract_source(
+        self, source: str, query: str
+    ) -> Generator[Tuple[List[DictRow], Dict[str, str]], None, None]:
+        """Page over a single source table and enrich the items its changes affect.
+
+        The source checkpoint is handed out with the last enriched batch of a page only,
+        so a page is read again unless all of its items were loaded. With partial updates
+        genre and person changes update only their fields. Saving them must not touch
+        `film_work.updated_at` then (TOUCH_MOVIES_ON_RELATED_SAVE of the admin panel),
+        otherwise the film_work source re-indexes the same films in full first.
+        """
+        partial_query = (
+            self._get_partial_queries().get(source)
+            if config.etl.partial_updates
+            else None
+        )
+        fields = tuple(f"{source}.{field}" for field in self.cursor_fields)
+        cursor_value = self._get_last_cursor(fields)
+        page_size = config.postgres.producer_page_size
+        while True:
+            with self.pg.connection() as pg_conn, pg_conn.cursor() as cursor:
+                with metrics.timer("pg.produce_seconds"):
+                    cursor.execute(query, (*cursor_value, page_size))
+                    changed = cursor.fetchall()
+            if not changed:
+                break
+            cursor_value = self._get_cursor(changed[-1])
+            item_ids = list(
+                dict.fromkeys(
+                    str(item_id) for row in changed for item_id in row["film_work_ids"]
+                )
+            )
+            metrics.incr(f"pg.changed_ids.{source}", len(item_ids))
+            position = 0
+            while True:
+                chunk = item_ids[position : position + self.enrich_size.size]
+                position += len(chunk)
+                if partial_query is None:
+                    rows = self._enrich(chunk)
+                else:
+                    rows = [
+                        Partial(
+                            str(row["id"]), {k: v for k, v in row.items() if k != "id"}
+                        )
+                        for row in self._enrich(chunk, partial_query)
+                    ]
+                if position < len(item_ids):
+                    yield rows, {}
+                else:
+                    yield rows, dict(zip(fields, cursor_value))
+                    break
+            if len(changed) < page_size:
+                break
+
+    def _extract_replicated(
+        self,
+    ) -> Generator[Tuple[List[DictRow], Dict[str, int]], None, None]:
+        """Read row changes from the replication slot and enrich the items they affect.
+
+        The confirmed LSN is handed out with the last batch of every read, deleted items
+        come as `Deleted` rows, so they are removed from the index as well.
+        """
+        while True:
+            changes, lsn = self.replication.read(
+                self.state.get_state("lsn") or 0,
+                timeout=0,
+                max_changes=config.postgres.producer_page_size,
+            )
+            if lsn is None:
+                break
+            item_ids, deleted_ids = self._resolve_changes(changes)
+            checkpoint = {"lsn": lsn}
+            position = 0
+            while position < len(item_ids):
+                chunk = item_ids[position : position + self.enrich_size.size]
+                position += len(chunk)
+                yield self._enrich(chunk), {}
+            yield [Deleted(item_id) for item_id in deleted_ids], checkpoint
+
+    def _resolve_changes(self, changes: List[Dict]) -> Tuple[List[str], List[str]]:
+        """Get ids of items to re-index and ids of deleted items from decoded row changes."""
+        tables = self._get_change_tables()
+        changed, deleted, related = {}, {}, defaultdict(dict)
+        for change in changes:
+            table = tables.get(change["table"])
+            value = table and get_column(change, table.column)
+            if value is None:
+                continue
+            if table.query is not None:
+                related[change["table"]][value] = None
+            elif change["table"] == self.item_table and change["action"] == "D":
+                changed.pop(value, None)
+                deleted[value] = None
+            else:
+                deleted.pop(value, None)
+                changed[value] = None
+        for table_name, values in related.items():
+            with self.pg.connection() as pg_conn, pg_conn.cursor() as cursor:
+                cursor.execute(tables[table_name].query, (list(values),))
+                for row in cursor.fetchall():
+                    if str(row["id"]) not in deleted:
+                        changed[str(row["id"])] = None
+        return list(changed), list(deleted)
+
+    def _save_checkpoint(self, checkpoint: Dict) -> None:
+        """Save state of a loaded batch, letting the replication slot move past it."""
+        super()._save_checkpoint(checkpoint)
+        if self.replication is not None:
+            # Only a flushed position may be confirmed, the server recycles WAL before it.
+            self.replication.confirm(self.state.get_saved_state("lsn") or 0)
+
+    def _enrich(self, item_ids: List[str], query: Optional[str] = None) -> List:
+        """Run the aggregation query for a bounded batch of item ids.
+
+        Item rows are tuples, rows of a `query` given instead are read as dict rows.
+        """
+        if not item_ids:
+            return []
+        cursor_factory = TupleCursor if query is None else DictCursor
+        with self.pg.connection() as pg_conn, pg_conn.cursor(
+            cursor_factory=cursor_factory
+        ) as cursor:
+            started = time.perf_counter()
+            cursor.execute(query or self._get_enrich_query(), (item_ids,))
+            rows = cursor.fetchall()
+            if query is None:
+                self._compile_transformer(cursor.description)
+        elapsed = time.perf_counter() - started
+        metrics.observe("pg.enrich_seconds", elapsed)
+        metrics.gauge("pg.enrich_size", self.enrich_size.update(len(item_ids), elapsed))
+        return rows
+
+    def _open_cursor(self, pg_conn):
+        """Open a server-side (named) cursor in streaming mode or a regular client-side one otherwise."""
+        if not config.postgres.server_side_cursor:
+            return pg_conn.cursor(cursor_factory=TupleCursor)
+        cursor = pg_conn.cursor(
+            name=f"{self.index_name}_extract", cursor_factory=TupleCursor
+        )
+        cursor.itersize = config.postgres.itersize
+        return cursor
+
+    def _fetch_batches(self, cursor) -> Generator[List[DictRow], None, None]:
+        """Split cursor results into batches of `config.postgres.limit` rows."""
+        if not config.postgres.server_side_cursor:
+            while True:
+                batch = cursor.fetchmany(config.postgres.limit)
+                if not batch:
+                    break
+                yield batch
+            return
+        # Iterating a named cursor pulls `itersize` rows per round trip,
+        # so only that many rows are held in memory at once.
+        rows = iter(cursor)
+        while True:
+            batch = list(islice(rows, config.postgres.limit))
+            if not batch:
+                break
+            yield batch
+
+    def _fetch_page(
+        self, cursor, started: float
+    ) -> Generator[List[DictRow], None, None]:
+        """Fetch a whole keyset page as one batch and adjust the next page size by the time it took."""
+        page = cursor.fetchall()
+        elapsed = time.perf_counter() - started
+        metrics.observe("pg.fetch_seconds", elapsed)
+        if page:
+            metrics.gauge("pg.fetch_size", self.fetch_size.update(len(page), elapsed))
+            yield page
 
     def load(self, transformed: List[Dict]):
         """Insert data into ElasticSearch and save new state on success."""
+        if not transformed:
+            return
+        digests = {}
+        if self.digests is not None:
+            transformed, digests = self._skip_unchanged(transformed)
+            if not transformed:
+                return
         self._post_to_elastic(transformed)
+        if digests:
+            self.digests.save_many(digests)
         logging.info(
             "Batch of %s %s uploaded to elasticsearch.",
             len(transformed),
             self.index_name,
         )
 
-    @backoff()
+    def _skip_unchanged(
+        self, actions: List[Dict]
+    ) -> Tuple[List[Dict], Dict[str, bytes]]:
+        """Drop actions of documents indexed with the same digest, get the rest along with new digests.
+
+        Digests of deleted and partially updated documents are forgotten before the action
+        is sent, so a document is never mistaken for an indexed one with stale content.
+        """
+        digests = {
+            str(action["_id"]): action.pop("_digest")
+            for action in actions
+            if "_digest" in action
+        }
+        stored = self.digests.get_many(list(digests))
+        changed = {
+            item_id: digest
+            for item_id, digest in digests.items()
+            if stored.get(item_id) != digest
+        }
+        forgotten = [str(action["_id"]) for action in actions if "_op_type" in action]
+        if forgotten:
+            self.digests.delete_many(forgotten)
+        kept = [
+            action
+            for action in actions
+            if "_op_type" in action or str(action["_id"]) in changed
+        ]
+        metrics.incr("es.skipped_docs", len(actions) - len(kept))
+        return kept, changed
+
     def _post_to_elastic(self, transformed: List[Dict]):
-        self.es.indices.create(index=self.index_name, body=self.index_body, ignore=400)
-        bulk(self.es, transformed)
+        """Index actions, retrying only the documents rejected with a retryable status.
 
+        Actions are encoded once, retries send the same NDJSON lines again.
+        """
+        encoded = self._encode(transformed)
+        pending = transformed
+        for attempt in range(config.elastic.max_retries + 1):
+            if attempt:
+                metrics.incr("es.retried_docs", len(pending))
+                logging.warning(
+                    "%s documents were rejected by elasticsearch, retrying...",
+                    len(pending),
+                )
+                time.sleep(get_sleep_time(attempt - 1))
+            with metrics.timer("es.bulk_seconds"):
+                pending = self._bulk(pending, encoded)
+            if not pending:
+                return
+        raise BulkIndexError(
+            f"{len(pending)} document(s) were still rejected after {config.elastic.max_retries} retries.",
+            pending,
+        )
 
-class MovieEtl(Etl):
-    """Extract queries from PostgreSQL database and load them into ElasticSearch index"""
+    def _encode(self, actions: List[Dict]) -> Dict[str, bytes]:
+        """Encode actions into NDJSON bulk lines by document id and report the serialization rate."""
+        started = time.perf_counter()
+        encoded = {
+            str(action["_id"]): encode_action(action, self.serializer)
+            for action in actions
+        }
+        elapsed = time.perf_counter() - started
+        size = sum(len(lines) for lines in encoded.values())
+        metrics.incr("es.serialized_bytes", size)
+        metrics.observe("es.serialize_seconds", elapsed)
+        if elapsed > 0:
+            metrics.gauge("es.serialized_bytes_per_second", size / elapsed)
+        return encoded
+
+    def _split_chunks(self, lines: List[bytes], chunk_size: int) -> List[List[bytes]]:
+        """Group encoded actions into bulk bodies of at most `chunk_size` actions and `max_chunk_bytes`."""
+        chunks, chunk, chunk_bytes = [], [], 0
+        for action_lines in lines:
+            if chunk and (
+                len(chunk) == chunk_size
+                or chunk_bytes + len(action_lines) > config.elastic.max_chunk_bytes
+            ):
+                chunks.append(chunk)
+                chunk, chunk_bytes = [], 0
+            chunk.append(action_lines)
+            chunk_bytes += len(action_lines)
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _send_chunk(self, chunk: List[bytes], action_ids: List[str]) -> List[Dict]:
+        """Send a pre-encoded bulk body and get result items of the actions that failed.
+
+        A whole request rejected with a retryable status fails every action of the chunk
+        with that status, so they are resent like documents rejected one by one.
+        """
+        try:
+            items = self.es.bulk(body=b"".join(chunk))["items"]
+        except TransportError as error:
+            if error.status_code not in RETRYABLE_STATUSES:
+                raise
+            metrics.incr("es.rejected_bulks")
+            return [
+                {"index": {"_id": action_id, "status": error.status_code}}
+                for action_id in action_ids
+            ]
+        return [
+            item
+            for item in items
+            if not 200 <= next(iter(item.values())).get("status", 500) < 300
+        ]
+
+    @backoff(exceptions=(ElasticConnectionError,), breaker="elasticsearch")
+    def _bulk(self, actions: List[Dict], encoded: Dict[str, bytes]) -> List[Dict]:
+        """Send actions in concurrent chunks and return the ones rejected with a retryable status.
+
+        Connection failures repeat the whole call, requests rejected as a whole with a retryable
+        status are resent by document, other failures are raised.
+        """
+        actions_by_id = {str(action["_id"]): action for action in actions}
+        action_ids = list(actions_by_id)
+        chunk_size = self.chunk_size.size
+        chunks = self._split_chunks(
+            [encoded[action_id] for action_id in action_ids], chunk_size
+        )
+        chunk_ids, position = [], 0
+        for chunk in chunks:
+            chunk_ids.append(action_ids[position : position + len(chunk)])
+            position += len(chunk)
+        started = time.perf_counter()
+        if config.elastic.bulk_workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(config.elastic.bulk_workers) as pool:
+                results = list(pool.map(self._send_chunk, chunks, chunk_ids))
+        else:
+            results = [
+                self._send_chunk(chunk, ids) for chunk, ids in zip(chunks, chunk_ids)
+            ]
+        failures = [item for chunk_failures in results for item in chunk_failures]
+        self._update_chunk_size(len(actions), chunk_size, time.perf_counter() - started)
+        return self._split_failures(failures, actions_by_id)
+
+
+class MoviesIndex:
+    """Queries of the movies index shared by sync and async ETL engines"""
+
+    item_table = "film_work"
+    extract_modes = ("query", "pipeline", "wal")
+    notify_function = "content.notify_film_work_changed"
 
     def _get_guery(self):
+        if config.postgres.raw_documents:
+            return movies_document_query
         return movies_query
 
-    def __init__(self) -> None:
+    def _get_changed_queries(self):
+        return changed_film_works_queries
+
+    def _get_enrich_query(self):
+        if config.postgres.raw_documents:
+            return movies_documents_by_ids_query
+        return movies_by_ids_query
+
+    def _get_partial_queries(self):
+        return {"person": film_work_persons_query, "genre": film_work_genres_query}
+
+    def _get_ids_query(self):
+        return film_work_ids_query
+
+    def _get_existing_ids_query(self):
+        return existing_film_work_ids_query
+
+    def _get_shard_query(self):
+        if config.postgres.raw_documents:
+            return movies_document_shard_query
+        return movies_shard_query
+
+    def _get_watermark_queries(self):
+        return changed_film_works_watermark_queries
+
+    def _get_change_tables(self):
+        return {
+            "film_work": TableChanges("id"),
+            "genre_film_work": TableChanges("film_work_id"),
+            "person_film_work": TableChanges("film_work_id"),
+            "genre": TableChanges("id", film_works_by_genre_query),
+            "person": TableChanges("id", film_works_by_person_query),
+        }
+
+
+class GenresIndex:
+    """Queries of the genres index shared by sync and async ETL engines"""
+
+    item_table = "genre"
+
+    def _get_guery(self):
+        return genres_query
+
+    def _get_shard_query(self):
+        return genres_shard_query
+
+    def _get_watermark_queries(self):
+        return {self.item_table: genre_watermark_query}
+
+    def _get_ids_query(self):
+        return genre_ids_query
+
+    def _get_existing_ids_query(self):
+        return existing_genre_ids_query
+
+
+class PersonsIndex:
+    """Queries of the persons index shared by sync and async ETL engines"""
+
+    item_table = "person"
+
+    def _get_guery(self):
+        return persons_query
+
+    def _get_shard_query(self):
+        return persons_shard_query
+
+    def _get_watermark_queries(self):
+        return {self.item_table: person_watermark_query}
+
+    def _get_ids_query(self):
+        return person_ids_query
+
+    def _get_existing_ids_query(self):
+        return existing_person_ids_query
+
+
+class MovieEtl(MoviesIndex, Etl):
+    """Extract queries from PostgreSQL database and load them into ElasticSearch index"""
+
+    def __init__(self, state_store: Optional[StateStore] = None) -> None:
         """Specifies config file and item name for generic ETL"""
-        super().__init__(index_name="movies")
+        super().__init__(index_name="movies", state_store=state_store)
+
+
+class GenreEtl(GenresIndex, Etl):
+    """Replicate genres from PostgreSQL database to ElasticSearch index"""
+
+    def __init__(self, state_store: Optional[StateStore] = None) -> None:
+        """Specifies item name for generic ETL"""
+        super().__init__(index_name="genres", state_store=state_store)
+
+
+class PersonEtl(PersonsIndex, Etl):
+    """Replicate persons from PostgreSQL database to ElasticSearch index"""
+
+    def __init__(self, state_store: Optional[StateStore] = None) -> None:
+        """Specifies item name for generic ETL"""
+        super().__init__(index_name="persons", state_store=state_store)
 
 
 if __name__ == "__main__":
-    MovieEtl().run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="build a new index version and switch the alias to it before replicating",
+    )
+    MovieEtl().run(reindex=parser.parse_args().reindex)
@@ -0,0 +1,101 @@
+from typing import Dict, List
+
+from elasticsearch import Elasticsearch
+
+# Index settings while a new version is being filled: no refreshes, replicas or per-request fsync.
+# Writes acknowledged before a crash may be lost, which is fine until the version is published:
+# the state is saved only after that.
+BULK_LOAD_SETTINGS = {
+    "refresh_interval": "-1",
+    "number_of_replicas": 0,
+    "translog": {"durability": "async"},
+}
+
+# Index settings while a backlog is loaded into the live index: no refreshes or replicas.
+# Every write is still fsynced, a checkpoint is saved as soon as its batch is acknowledged.
+LIVE_BULK_LOAD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+
+def get_serving_settings(body: Dict) -> Dict:
+    """Get dynamic settings of an index serving searches, as configured in its body or by default."""
+    settings = body.get("settings", {})
+    return {
+        "refresh_interval": settings.get("refresh_interval", "1s"),
+        "number_of_replicas": settings.get("number_of_replicas", 1),
+        "translog": {
+            "durability": settings.get("translog", {}).get("durability", "request")
+        },
+    }
+
+
+class MappingDriftError(Exception):
+    """Live index mapping differs from the one in the index file."""
+
+
+def get_mapping_drift(live_mappings: Dict, body: Dict) -> List[str]:
+    """Get names of live indices, as returned by `indices.get_mapping`, whose mapping differs from the body."""
+    return [
+        name
+        for name, mapping in live_mappings.items()
+        if mapping["mappings"] != body["mappings"]
+    ]
+
+
+def bootstrap_index(es: Elasticsearch, alias: str, body: Dict) -> List[str]:
+    """Create the first version of an index behind the alias unless it exists, get indices whose mapping drifted."""
+    if not es.indices.exists(index=alias):
+        es.indices.create(
+            index=f"{alias}_v1", body={**body, "aliases": {alias: {}}}, ignore=400
+        )
+        return []
+    return get_mapping_drift(es.indices.get_mapping(index=alias), body)
+
+
+def get_alias_indices(es: Elasticsearch, alias: str) -> List[str]:
+    """Get names of indices the alias points to."""
+    if not es.indices.exists_alias(name=alias):
+        return []
+    return list(es.indices.get_alias(name=alias))
+
+
+def create_version(es: Elasticsearch, alias: str, body: Dict) -> str:
+    """Create the next `<alias>_v<N>` index with bulk load settings and get its name.
+
+    Versions left over by failed rebuilds, not pointed to by the alias, are removed.
+    """
+    live = set(get_alias_indices(es, alias))
+    versions = {}
+    for name in es.indices.get(index=f"{alias}_v*"):
+        suffix = name[len(alias) + 2 :]
+        if suffix.isdigit():
+            versions[name] = int(suffix)
+    for name in versions:
+        if name not in live:
+            es.indices.delete(index=name)
+    index = f"{alias}_v{max(versions.values(), default=0) + 1}"
+    settings = {**body.get("settings", {}), **BULK_LOAD_SETTINGS}
+    es.indices.create(index=index, body={**body, "settings": settings})
+    return index
+
+
+def publish_version(
+    es: Elasticsearch, alias: str, index: str, body: Dict, merge_timeout: float
+) -> None:
+    """Restore serving settings of a filled index, merge it and atomically point the alias to it.
+
+    Indices the alias pointed to before are dropped within the same request, as well as
+    an index named like the alias that was created before versioning.
+    """
+    es.indices.put_settings(index=index, body=get_serving_settings(body))
+    es.indices.refresh(index=index)
+    es.indices.forcemerge(
+        index=index, max_num_segments=1, request_timeout=merge_timeout
+    )
+    actions = [{"add": {"index": index, "alias": alias}}]
+    previous = get_alias_indices(es, alias)
+    if not previous and es.indices.exists(index=alias):
+        previous = [alias]
+    actions.extend(
+        {"remove_index": {"index": name}} for name in previous if name != index
+    )
+    es.indices.update_aliases(body={"actions": actions})
@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+
+
+class Metrics:
+    """Thread-safe in-process counters, gauges and timings of the ETL process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.gauges: Dict[str, float] = {}
+        self.timings: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"count": 0, "total": 0.0, "max": 0.0}
+        )
+        self._last_logged = time.monotonic()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increase counter `name` by `value`."""
+        with self._lock:
+            self.counters[name] += value
+
+    def gauge(self, name: str, value: float) -> None:
+        """Set current value of gauge `name`."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a single duration measurement for `name`."""
+        with self._lock:
+            timing = self.timings[name]
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Measure execution time of the wrapped block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Get a copy of all collected values."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "timings": {name: dict(value) for name, value in self.timings.items()},
+            }
+
+    def log(self) -> None:
+        """Write collected values to the log."""
+        logging.info("Metrics: %s", self.snapshot())
+        self._last_logged = time.monotonic()
+
+    def log_every(self, interval: float) -> None:
+        """Write collected values to the log if `interval` seconds passed since the last report."""
+        if time.monotonic() - self._last_logged >= interval:
+            self.log()
+
+
+metrics = Metrics()
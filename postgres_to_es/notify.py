@@ -0,0 +1,97 @@
+import logging
+import select
+import time
+from typing import List, Optional
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import connection as PgConnection
+
+from backoff import CircuitOpenError, backoff
+from metrics import metrics
+
+# Whether a trigger function mentions the channel it is expected to notify on.
+NOTIFY_FUNCTION_QUERY = """
+select position(quote_literal(%s) in prosrc) > 0 from pg_proc where oid = to_regproc(%s)
+"""
+
+
+class ChangeListener:
+    """LISTEN for ids of changed items on a dedicated autocommit connection.
+
+    The channel is named in the trigger function too, `function` is checked to notify on it.
+    """
+
+    def __init__(self, dsn: dict, channel: str, function: Optional[str] = None):
+        self.dsn = dsn
+        self.channel = channel
+        self.function = function
+        self.conn: Optional[PgConnection] = None
+
+    @backoff(exceptions=(psycopg2.OperationalError,), breaker="postgres")
+    def _connect(self) -> PgConnection:
+        """Open a connection and subscribe to the channel using a backoff."""
+        conn = psycopg2.connect(**self.dsn)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+            if self.function is not None:
+                cursor.execute(NOTIFY_FUNCTION_QUERY, (self.channel, self.function))
+                row = cursor.fetchone()
+                if row is None or not row[0]:
+                    logging.warning(
+                        "%s does not notify on %s channel, changes are only polled.",
+                        self.function,
+                        self.channel,
+                    )
+        logging.info("Listening for changes on %s channel.", self.channel)
+        return conn
+
+    def collect(self, timeout: float, window: float, max_ids: int) -> List[str]:
+        """Wait up to `timeout` seconds for a notification, then coalesce ids arriving within `window` seconds.
+
+        Notifications sent while the connection was down are lost, polling picks those changes up.
+        A failed connection waits out the timeout, so callers do not reconnect in a busy loop.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            if self.conn is None or self.conn.closed:
+                self.conn = self._connect()
+            if not self._wait(timeout):
+                return []
+            item_ids = {}
+            window_deadline = time.monotonic() + window
+            while True:
+                while self.conn.notifies and len(item_ids) < max_ids:
+                    item_ids[self.conn.notifies.pop(0).payload] = None
+                remaining = window_deadline - time.monotonic()
+                if remaining <= 0 or len(item_ids) >= max_ids:
+                    break
+                self._wait(remaining)
+        except CircuitOpenError as error:
+            logging.warning("Not listening: %s.", error)
+            self.close()
+            time.sleep(max(deadline - time.monotonic(), 0))
+            return []
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            logging.exception("Listening connection lost.")
+            self.close()
+            time.sleep(max(deadline - time.monotonic(), 0))
+            return []
+        metrics.incr("pg.notified_ids", len(item_ids))
+        return list(item_ids)
+
+    def _wait(self, timeout: float) -> bool:
+        """Block until notifications arrive or `timeout` expires, tell whether there are any."""
+        self.conn.poll()
+        if not self.conn.notifies and timeout > 0:
+            readable, _, _ = select.select([self.conn], [], [], timeout)
+            if readable:
+                self.conn.poll()
+        return bool(self.conn.notifies)
+
+    def close(self) -> None:
+        """Close the listening connection."""
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+        self.conn = None
@@ -0,0 +1,114 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, Sequence, Tuple
+
+_DONE = object()
+
+
+class _Failure:
+    """Exception raised in a stage thread, passed downstream to be re-raised by the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(target: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Put item into a bounded queue, giving up once the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(source: queue.Queue, stop: threading.Event) -> Any:
+    """Get item from a queue, returning `_DONE` once the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            return source.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def _produce(items: Iterable, target: queue.Queue, stop: threading.Event) -> None:
+    """Move items of the source iterable into the first queue."""
+    iterator = iter(items)
+    try:
+        for item in iterator:
+            if not _put(target, item, stop):
+                return
+        _put(target, _DONE, stop)
+    except BaseException as error:
+        _put(target, _Failure(error), stop)
+    finally:
+        # Generators release their resources (cursors, transactions) in the thread that used them.
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def _process(
+    func: Callable,
+    source: queue.Queue,
+    target: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    """Apply a stage function to the payload of every (payload, checkpoint) item."""
+    while True:
+        item = _get(source, stop)
+        if item is _DONE or isinstance(item, _Failure):
+            _put(target, item, stop)
+            return
+        payload, checkpoint = item
+        try:
+            result = func(payload)
+        except BaseException as error:
+            _put(target, _Failure(error), stop)
+            return
+        if not _put(target, (result, checkpoint), stop):
+            return
+
+
+def run_pipelined(
+    items: Iterable[Tuple[Any, Any]],
+    stages: Sequence[Callable],
+    queue_size: int,
+) -> Iterator[Tuple[Any, Any]]:
+    """Feed (payload, checkpoint) items through stages running concurrently in threads.
+
+    Stages are connected with bounded queues, so a stage running ahead of the next one blocks
+    instead of piling up batches in memory. Results are yielded in the source order.
+    """
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    threads = [
+        threading.Thread(
+            target=_produce, args=(items, queues[0], stop), name="etl-source"
+        )
+    ]
+    threads += [
+        threading.Thread(
+            target=_process,
+            args=(stage, queues[i], queues[i + 1], stop),
+            name=f"etl-stage-{i}",
+        )
+        for i, stage in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
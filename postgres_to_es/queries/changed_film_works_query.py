@@ -0,0 +1,109 @@
+# Producer queries of the two-phase pipeline: each one pages over its own table by its own
+# (timestamp, id) keyset and returns ids of film works affected by the changed rows.
+# Columns are named `id` and `updated_at` so the same keyset cursor logic applies to every source.
+
+changed_film_works_queries = {
+    "film_work": """
+SELECT fw.id          AS id,
+       fw.updated_at  AS updated_at,
+       ARRAY [fw.id]  AS film_work_ids
+FROM content.film_work fw
+WHERE (fw.updated_at, fw.id) > (%s, %s)
+ORDER BY fw.updated_at, fw.id
+LIMIT %s;
+""",
+    "person": """
+SELECT p.id                                                                            AS id,
+       p.updated_at                                                                    AS updated_at,
+       ARRAY(SELECT pfw.film_work_id FROM content.person_film_work pfw WHERE pfw.person_id = p.id) AS film_work_ids
+FROM content.person p
+WHERE (p.updated_at, p.id) > (%s, %s)
+ORDER BY p.updated_at, p.id
+LIMIT %s;
+""",
+    "genre": """
+SELECT g.id                                                                            AS id,
+       g.updated_at                                                                    AS updated_at,
+       ARRAY(SELECT gfw.film_work_id FROM content.genre_film_work gfw WHERE gfw.genre_id = g.id) AS film_work_ids
+FROM content.genre g
+WHERE (g.updated_at, g.id) > (%s, %s)
+ORDER BY g.updated_at, g.id
+LIMIT %s;
+""",
+    "person_film_work": """
+SELECT pfw.id                    AS id,
+       pfw.created_at            AS updated_at,
+       ARRAY [pfw.film_work_id]  AS film_work_ids
+FROM content.person_film_work pfw
+WHERE (pfw.created_at, pfw.id) > (%s, %s)
+ORDER BY pfw.created_at, pfw.id
+LIMIT %s;
+""",
+    "genre_film_work": """
+SELECT gfw.id                    AS id,
+       gfw.created_at            AS updated_at,
+       ARRAY [gfw.film_work_id]  AS film_work_ids
+FROM content.genre_film_work gfw
+WHERE (gfw.created_at, gfw.id) > (%s, %s)
+ORDER BY gfw.created_at, gfw.id
+LIMIT %s;
+""",
+}
+
+# Queries resolving ids of changed rows to ids of affected film works for change data capture.
+
+film_works_by_person_query = """
+SELECT DISTINCT pfw.film_work_id AS id
+FROM content.person_film_work pfw
+WHERE pfw.person_id = ANY(%s::uuid[]);
+"""
+
+film_works_by_genre_query = """
+SELECT DISTINCT gfw.film_work_id AS id
+FROM content.genre_film_work gfw
+WHERE gfw.genre_id = ANY(%s::uuid[]);
+"""
+
+# Latest keyset position of every producer source, polling resumes from it after a full reindex.
+
+changed_film_works_watermark_queries = {
+    source: f"""
+SELECT {column} AS updated_at, id
+FROM content.{source}
+WHERE {column} IS NOT NULL
+ORDER BY {column} DESC, id DESC
+LIMIT 1;
+"""
+    for source, column in (
+        ("film_work", "updated_at"),
+        ("person", "updated_at"),
+        ("genre", "updated_at"),
+        ("person_film_work", "created_at"),
+        ("genre_film_work", "created_at"),
+    )
+}
+
+# Partial updates: person and genre fields of the given film works, aggregated without the rest of the film.
+# Expressions match `_movies_aggregate_query`, so a partial update leaves the same document a full one would.
+
+film_work_persons_query = """
+SELECT fw.id                                                                                                     AS id,
+       ARRAY_AGG(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'director')                                      AS director,
+       JSON_AGG(DISTINCT jsonb_build_object('id', p.id, 'name', p.full_name)) FILTER (WHERE pfw.role = 'actor')  AS actors,
+       JSON_AGG(DISTINCT jsonb_build_object('id', p.id, 'name', p.full_name)) FILTER (WHERE pfw.role = 'writer') AS writers,
+       ARRAY_AGG(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'actor')                                         AS actors_names,
+       ARRAY_AGG(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'writer')                                        AS writers_names
+FROM UNNEST(%s::uuid[]) AS fw(id)
+         LEFT OUTER JOIN content.person_film_work pfw ON (fw.id = pfw.film_work_id)
+         LEFT OUTER JOIN content.person p ON (pfw.person_id = p.id)
+GROUP BY fw.id;
+"""
+
+film_work_genres_query = """
+SELECT fw.id                       AS id,
+       ARRAY_AGG(DISTINCT g.name)  AS genre
+FROM UNNEST(%s::uuid[]) AS fw(id)
+         LEFT OUTER JOIN content.genre_film_work gfw ON fw.id = gfw.film_work_id
+         LEFT OUTER JOIN content.genre g ON (gfw.genre_id = g.id)
+GROUP BY fw.id;
+"""
@@ -0,0 +1,42 @@
+genres_query = """
+SELECT g.id          as id,
+       g.name        as name,
+       g.description as description,
+       g.updated_at  as updated_at
+FROM content.genre g
+WHERE (g.updated_at, g.id) > (%s, %s)
+ORDER BY g.updated_at, g.id
+LIMIT %s;
+"""
+
+genre_ids_query = """
+SELECT id::text AS id
+FROM content.genre
+ORDER BY id;
+"""
+
+existing_genre_ids_query = """
+SELECT id::text AS id
+FROM content.genre
+WHERE id = ANY(%s::uuid[]);
+"""
+
+genres_shard_query = """
+SELECT g.id          as id,
+       g.name        as name,
+       g.description as description,
+       g.updated_at  as updated_at
+FROM content.genre g
+WHERE (%(after)s::uuid IS NULL OR g.id > %(after)s::uuid)
+  AND (%(upto)s::uuid IS NULL OR g.id <= %(upto)s::uuid)
+ORDER BY g.id
+LIMIT %(limit)s;
+"""
+
+genre_watermark_query = """
+SELECT updated_at, id
+FROM content.genre
+WHERE updated_at IS NOT NULL
+ORDER BY updated_at DESC, id DESC
+LIMIT 1;
+"""
@@ -1,4 +1,4 @@
-movies_query = """
+_movies_aggregate_query = """
 SELECT fw.id                                                                                                     as id,
        fw.title                                                                                                  as title,
        fw.description                                                                                            as description,
@@ -10,12 +10,91 @@ SELECT fw.id
        ARRAY_AGG(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'actor')                                         AS actors_names,
        ARRAY_AGG(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'writer')                                        AS writers_names,
        fw.updated_at                                                                                             as updated_at
-FROM content.film_work fw
+FROM ({film_works}) fw
          LEFT OUTER JOIN content.genre_film_work gfw ON fw.id = gfw.film_work_id
          LEFT OUTER JOIN content.genre g ON (gfw.genre_id = g.id)
          LEFT OUTER JOIN content.person_film_work pfw ON (fw.id = pfw.film_work_id)
          LEFT OUTER JOIN content.person p ON (pfw.person_id = p.id)
-WHERE fw.updated_at > %s
-GROUP BY fw.id, fw.title, fw.description, fw.rating
-ORDER BY fw.updated_at;
+GROUP BY fw.id, fw.title, fw.description, fw.rating, fw.updated_at
+ORDER BY fw.updated_at, fw.id;
 """
+
+movies_query = _movies_aggregate_query.format(
+    # Keyset page over the (updated_at, id) index: only this page gets joined and aggregated.
+    film_works="""
+         SELECT id, title, description, rating, updated_at
+         FROM content.film_work
+         WHERE (updated_at, id) > (%s, %s)
+         ORDER BY updated_at, id
+         LIMIT %s
+    """
+)
+
+movies_by_ids_query = _movies_aggregate_query.format(
+    film_works="""
+         SELECT id, title, description, rating, updated_at
+         FROM content.film_work
+         WHERE id = ANY(%s::uuid[])
+    """
+)
+
+# Deletion reconciliation: all film work ids in index order and a re-check of candidates.
+
+film_work_ids_query = """
+SELECT id::text AS id
+FROM content.film_work
+ORDER BY id;
+"""
+
+existing_film_work_ids_query = """
+SELECT id::text AS id
+FROM content.film_work
+WHERE id = ANY(%s::uuid[]);
+"""
+
+# Sharded full reindex: a keyset page of a single id range.
+
+movies_shard_query = _movies_aggregate_query.format(
+    film_works="""
+         SELECT id, title, description, rating, updated_at
+         FROM content.film_work
+         WHERE (%(after)s::uuid IS NULL OR id > %(after)s::uuid)
+           AND (%(upto)s::uuid IS NULL OR id <= %(upto)s::uuid)
+         ORDER BY id
+         LIMIT %(limit)s
+    """
+)
+
+# Ready-to-index documents: every aggregated film is built into its JSON document by PostgreSQL,
+# shaped like index/movies.json, and passed to the bulk body as text without decoding.
+
+_movies_document_query = """
+SELECT m.id,
+       m.updated_at,
+       jsonb_build_object(
+           'id', m.id,
+           'title', m.title,
+           'description', m.description,
+           'imdb_rating', m.imdb_rating,
+           'genre', m.genre,
+           'director', m.director,
+           'actors', m.actors,
+           'writers', m.writers,
+           'actors_names', m.actors_names,
+           'writers_names', m.writers_names
+       )::text AS document
+FROM ({movies}) m
+ORDER BY m.updated_at, m.id;
+"""
+
+movies_document_query = _movies_document_query.format(
+    movies=movies_query.rstrip().rstrip(";")
+)
+
+movies_documents_by_ids_query = _movies_document_query.format(
+    movies=movies_by_ids_query.rstrip().rstrip(";")
+)
+
+movies_document_shard_query = _movies_document_query.format(
+    movies=movies_shard_query.rstrip().rstrip(";")
+)
@@ -0,0 +1,40 @@
+persons_query = """
+SELECT p.id         as id,
+       p.full_name  as full_name,
+       p.updated_at as updated_at
+FROM content.person p
+WHERE (p.updated_at, p.id) > (%s, %s)
+ORDER BY p.updated_at, p.id
+LIMIT %s;
+"""
+
+person_ids_query = """
+SELECT id::text AS id
+FROM content.person
+ORDER BY id;
+"""
+
+existing_person_ids_query = """
+SELECT id::text AS id
+FROM content.person
+WHERE id = ANY(%s::uuid[]);
+"""
+
+persons_shard_query = """
+SELECT p.id         as id,
+       p.full_name  as full_name,
+       p.updated_at as updated_at
+FROM content.person p
+WHERE (%(after)s::uuid IS NULL OR p.id > %(after)s::uuid)
+  AND (%(upto)s::uuid IS NULL OR p.id <= %(upto)s::uuid)
+ORDER BY p.id
+LIMIT %(limit)s;
+"""
+
+person_watermark_query = """
+SELECT updated_at, id
+FROM content.person
+WHERE updated_at IS NOT NULL
+ORDER BY updated_at DESC, id DESC
+LIMIT 1;
+"""
@@ -0,0 +1,34 @@
+from typing import Iterable, Iterator
+
+from elasticsearch import Elasticsearch
+
+
+def iter_index_ids(es: Elasticsearch, index: str, page_size: int) -> Iterator[str]:
+    """Stream ids of indexed documents in ascending order, page by page with `search_after`."""
+    body = {
+        "size": page_size,
+        "_source": False,
+        "query": {"exists": {"field": "id"}},
+        "sort": [{"id": "asc"}],
+    }
+    while True:
+        hits = es.search(index=index, body=body)["hits"]["hits"]
+        for hit in hits:
+            yield hit["sort"][0]
+        if len(hits) < page_size:
+            return
+        body["search_after"] = hits[-1]["sort"]
+
+
+def find_orphans(source_ids: Iterable[str], index_ids: Iterable[str]) -> Iterator[str]:
+    """Merge two ascending id streams and yield indexed ids missing from the source.
+
+    Only the current id of each stream is kept in memory.
+    """
+    source = iter(source_ids)
+    current = next(source, None)
+    for index_id in index_ids:
+        while current is not None and current < index_id:
+            current = next(source, None)
+        if current != index_id:
+            yield index_id
@@ -0,0 +1,139 @@
+import json
+import logging
+import select
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import psycopg2
+import psycopg2.errors
+from psycopg2.extras import LogicalReplicationConnection, ReplicationCursor
+
+from backoff import backoff
+from metrics import metrics
+
+# Position the replication slot has confirmed, as an integer LSN.
+SLOT_LSN_QUERY = """
+select confirmed_flush_lsn - '0/0' from pg_replication_slots where slot_name = %s
+"""
+
+
+class TableChanges(NamedTuple):
+    """How row changes of a source table point to indexed items."""
+
+    # Column holding the item id, or the value passed to `query` to resolve item ids.
+    column: str
+    # Query taking an array of `column` values and returning `id` of affected items.
+    query: Optional[str] = None
+
+
+class Deleted(NamedTuple):
+    """Extracted row of an item deleted from the source, loaded as a `delete` action."""
+
+    id: str
+
+
+class Partial(NamedTuple):
+    """Extracted fields of an item changed in part, loaded as an `update` action."""
+
+    id: str
+    doc: Dict
+
+
+class ReplicationSource:
+    """Read row changes of given tables from a logical replication slot decoded by wal2json."""
+
+    def __init__(self, dsn: dict, slot_name: str, tables: List[str]):
+        self.dsn = dsn
+        self.slot_name = slot_name
+        self.tables = tables
+        self.conn: Optional[LogicalReplicationConnection] = None
+        self.cursor: Optional[ReplicationCursor] = None
+        # Position of the last change loaded into the index, reported back to the server.
+        self.confirmed_lsn = 0
+
+    @backoff(exceptions=(psycopg2.OperationalError,), breaker="postgres")
+    def ensure_slot(self) -> None:
+        """Create the slot unless it exists, changes are retained from then on."""
+        conn = psycopg2.connect(
+            **self.dsn, connection_factory=LogicalReplicationConnection
+        )
+        try:
+            with conn.cursor() as cursor:
+                self._create_slot(cursor)
+        finally:
+            conn.close()
+
+    def _create_slot(self, cursor: ReplicationCursor) -> None:
+        """Create the slot with a replication cursor, an existing one is kept."""
+        try:
+            cursor.create_replication_slot(self.slot_name, output_plugin="wal2json")
+            logging.info("Replication slot %s created.", self.slot_name)
+        except psycopg2.errors.DuplicateObject:
+            pass
+
+    @backoff(exceptions=(psycopg2.OperationalError,), breaker="postgres")
+    def _connect(self, start_lsn: int) -> None:
+        """Open a replication connection, creating the slot on first run, and start streaming."""
+        self.conn = psycopg2.connect(
+            **self.dsn, connection_factory=LogicalReplicationConnection
+        )
+        self.cursor = self.conn.cursor()
+        self._create_slot(self.cursor)
+        self.cursor.start_replication(
+            slot_name=self.slot_name,
+            decode=True,
+            start_lsn=start_lsn,
+            options={"format-version": "2", "add-tables": ",".join(self.tables)},
+        )
+
+    def read(
+        self, start_lsn: int, timeout: float, max_changes: int
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """Read up to `max_changes` row changes waiting at most `timeout` seconds for them.
+
+        Returns decoded changes along with the LSN of the last one.
+        """
+        changes, lsn = [], None
+        try:
+            if self.cursor is None:
+                self.confirmed_lsn = max(self.confirmed_lsn, start_lsn)
+                self._connect(start_lsn)
+            deadline = time.monotonic() + timeout
+            while len(changes) < max_changes:
+                message = self.cursor.read_message()
+                if message is None:
+                    # Doubles as a keepalive, the server drops silent replication connections.
+                    self.cursor.send_feedback(flush_lsn=self.confirmed_lsn)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    select.select([self.cursor], [], [], remaining)
+                    continue
+                lsn = message.data_start
+                change = json.loads(message.payload)
+                if change["action"] in ("I", "U", "D"):
+                    changes.append(change)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.close()
+            raise
+        metrics.incr("pg.replicated_changes", len(changes))
+        return changes, lsn
+
+    def confirm(self, lsn: int) -> None:
+        """Mark changes up to `lsn` as loaded, the server may recycle WAL before it."""
+        self.confirmed_lsn = max(self.confirmed_lsn, lsn)
+
+    def close(self) -> None:
+        """Close the replication connection."""
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+        self.conn = self.cursor = None
+
+
+def get_column(change: Dict, name: str):
+    """Get a column value of a decoded change, old key values are used for deletions."""
+    columns = change["identity"] if change["action"] == "D" else change["columns"]
+    for column in columns:
+        if column["name"] == name:
+            return column["value"]
+    return None
@@ -0,0 +1,25 @@
+import random
+
+
+class IdlePoller:
+    """Decide how long to sleep between replication passes.
+
+    While passes keep loading documents the backlog is drained without any pause. Once a pass
+    finds nothing, the delay grows exponentially from `min_delay` up to `max_delay` with a random
+    jitter, so idle workers neither hammer the database nor poll in lockstep.
+    """
+
+    def __init__(self, min_delay: float, max_delay: float, factor: float = 2):
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.factor = factor
+        self.idle_passes = 0
+
+    def next_delay(self, loaded: int) -> float:
+        """Get sleep time after a pass which loaded `loaded` documents."""
+        if loaded:
+            self.idle_passes = 0
+            return 0
+        border = min(self.max_delay, self.min_delay * self.factor**self.idle_passes)
+        self.idle_passes += 1
+        return random.uniform(self.min_delay, border)
@@ -0,0 +1,57 @@
+from typing import Dict
+
+from elasticsearch.serializer import JSONSerializer
+
+# Action keys sent in the bulk action line rather than in the document.
+ACTION_METADATA = ("_index", "_id")
+
+
+class JsonSerializer(JSONSerializer):
+    """Standard library serializer of the ElasticSearch client, also producing bytes for bulk bodies."""
+
+    def dumps_bytes(self, data) -> bytes:
+        return self.dumps(data).encode()
+
+
+class OrjsonSerializer(JSONSerializer):
+    """orjson-backed serializer, UUID and datetime values are encoded natively."""
+
+    def __init__(self):
+        # An optional dependency, needed only once this serializer is configured.
+        import orjson
+
+        self.orjson = orjson
+
+    def dumps_bytes(self, data) -> bytes:
+        if isinstance(data, bytes):
+            return data
+        if isinstance(data, str):
+            return data.encode()
+        return self.orjson.dumps(data, default=self.default)
+
+    def dumps(self, data) -> str:
+        if isinstance(data, (str, bytes)):
+            return data
+        return self.dumps_bytes(data).decode()
+
+    def loads(self, s):
+        return self.orjson.loads(s)
+
+
+SERIALIZERS = {"json": JsonSerializer, "orjson": OrjsonSerializer}
+
+
+def encode_action(action: Dict, serializer) -> bytes:
+    """Encode an index, update or delete action as newline terminated NDJSON lines of a bulk body."""
+    op_type = action.get("_op_type", "index")
+    metadata = {key: action[key] for key in ACTION_METADATA if key in action}
+    line = serializer.dumps_bytes({op_type: metadata}) + b"\n"
+    if op_type == "delete":
+        return line
+    if op_type == "update":
+        return line + serializer.dumps_bytes({"doc": action["doc"]}) + b"\n"
+    if "_source" in action:
+        # Already encoded.
+        return line + serializer.dumps_bytes(action["_source"]) + b"\n"
+    document = {key: value for key, value in action.items() if key[0] != "_"}
+    return line + serializer.dumps_bytes(document) + b"\n"
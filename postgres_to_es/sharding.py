@@ -0,0 +1,27 @@
+import uuid
+from typing import List, Optional, Tuple
+
+
+def split_id_range(shards: int) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Split the UUID space into `shards` disjoint (after, up to] ranges of equal width.
+
+    `None` stands for an open bound of the first and the last range.
+    """
+    bounds = [
+        str(uuid.UUID(int=shard * (1 << 128) // shards)) for shard in range(1, shards)
+    ]
+    lower = [None, *bounds]
+    upper = [*bounds, None]
+    return list(zip(lower, upper))
+
+
+def reindex_shard(
+    etl_class, target_index: str, after: Optional[str], upto: Optional[str]
+) -> int:
+    """Worker process entry point: load a single id range into the target index and get the number of loaded documents."""
+    etl = etl_class()
+    etl.target_index = target_index
+    try:
+        return etl.load_shard(after, upto)
+    finally:
+        etl.pg.close()
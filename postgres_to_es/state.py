@@ -1,7 +1,18 @@
 import abc
+import copy
 import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
 from typing import Any, Optional
 
+from psycopg2 import sql
+from psycopg2.extras import Json
+
+from connection import PostgresConnection
+
 
 class BaseStorage:
     @abc.abstractmethod
@@ -16,15 +27,38 @@ class BaseStorage:
 
 
 class JsonFileStorage(BaseStorage):
-    def __init__(self, file_path: Optional[str] = None):
+    def __init__(self, file_path: Optional[str] = None, fsync: bool = False):
         self.file_path = file_path
+        self.fsync = fsync
 
     def save_state(self, state: dict) -> None:
-        """Сохранить состояние в постоянное хранилище"""
+        """Сохранить состояние в постоянное хранилище
+
+        Состояние пишется во временный файл рядом и атомарно подменяет старый,
+        поэтому падение посреди записи не портит сохранённое состояние.
+        """
         if self.file_path is None:
             return
-        with open(self.file_path, "w") as file:
-            json.dump(state, file)
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".state-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(state, file)
+                if self.fsync:
+                    file.flush()
+                    os.fsync(file.fileno())
+            os.replace(temp_path, self.file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        if self.fsync:
+            # Переименование становится надёжным только после fsync каталога.
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
 
     def retrieve_state(self) -> dict:
         """Загрузить состояние локально из постоянного хранилища"""
@@ -36,20 +70,172 @@ class JsonFileStorage(BaseStorage):
             return {}
 
 
-class State:
+class SqliteStorage(BaseStorage):
+    """Хранилище состояния в таблице ключ-значение файла SQLite"""
+
+    def __init__(self, file_path: str, table: str = "etl_state"):
+        self.table = table
+        self.conn = sqlite3.connect(file_path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.table}" (key TEXT PRIMARY KEY, value TEXT)'
+            )
+
+    def save_state(self, state: dict) -> None:
+        """Сохранить состояние в постоянное хранилище одной транзакцией"""
+        with self.conn:
+            self.conn.executemany(
+                f'INSERT OR REPLACE INTO "{self.table}" (key, value) VALUES (?, ?)',
+                [(key, json.dumps(value)) for key, value in state.items()],
+            )
+
+    def retrieve_state(self) -> dict:
+        """Загрузить состояние локально из постоянного хранилища"""
+        rows = self.conn.execute(f'SELECT key, value FROM "{self.table}"')
+        return {key: json.loads(value) for key, value in rows}
+
+
+class PostgresStorage(BaseStorage):
+    """Хранилище состояния в таблице исходной базы PostgreSQL рядом с данными, которые оно описывает"""
+
+    def __init__(self, pg: PostgresConnection, table: str = "etl_state"):
+        self.pg = pg
+        self.table = sql.Identifier(table)
+        with self.pg.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                sql.SQL(
+                    "CREATE TABLE IF NOT EXISTS {} "
+                    "(key TEXT PRIMARY KEY, value JSONB, updated_at TIMESTAMPTZ DEFAULT now())"
+                ).format(self.table)
+            )
+            conn.commit()
+
+    def save_state(self, state: dict) -> None:
+        """Сохранить состояние в постоянное хранилище одной транзакцией"""
+        query = sql.SQL(
+            "INSERT INTO {} (key, value) VALUES (%s, %s) "
+            "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = now()"
+        ).format(self.table)
+        with self.pg.connection() as conn, conn.cursor() as cursor:
+            cursor.executemany(
+                query, [(key, Json(value)) for key, value in state.items()]
+            )
+            conn.commit()
+
+    def retrieve_state(self) -> dict:
+        """Загрузить состояние локально из постоянного хранилища"""
+        with self.pg.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(sql.SQL("SELECT key, value FROM {}").format(self.table))
+            return {key: value for key, value in cursor.fetchall()}
+
+
+class StateStore:
     """
-    Класс для хранения состояния при работе с данными, чтобы постоянно не перечитывать данные с начала.
+    Общее хранилище состояний нескольких пайплайнов одного процесса.
+
+    Состояние каждого пайплайна лежит в своём пространстве имён, поэтому пайплайны не затирают
+    курсоры друг друга. Изменения всех пайплайнов копятся в памяти и записываются в хранилище
+    одной записью раз в `flush_every` обновлений или `flush_interval` секунд.
     """
 
-    def __init__(self, storage: BaseStorage):
+    def __init__(
+        self,
+        storage: BaseStorage,
+        flush_every: int = 1,
+        flush_interval: Optional[float] = None,
+        legacy_namespace: Optional[str] = None,
+    ):
         self.storage = storage
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
         self.state = self.storage.retrieve_state()
+        if legacy_namespace is not None:
+            self._adopt_legacy_state(legacy_namespace)
+        # Последнее состояние, которое точно записано в хранилище.
+        self.saved_state = copy.deepcopy(self.state)
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+
+    def _adopt_legacy_state(self, namespace: str) -> None:
+        """Перенести плоское состояние без пространств имён в пространство `namespace`"""
+        legacy = {k: v for k, v in self.state.items() if not isinstance(v, dict)}
+        if legacy:
+            for key in legacy:
+                del self.state[key]
+            self.state.setdefault(namespace, {}).update(legacy)
+
+    def namespace(self, name: str) -> "State":
+        """Получить состояние пайплайна `name`"""
+        return State(self, name)
+
+    def update(self, namespace: str, values: dict) -> None:
+        """Установить состояние нескольких ключей пространства имён"""
+        with self._lock:
+            self.state.setdefault(namespace, {}).update(values)
+            self._pending += 1
+            if self._pending >= self.flush_every or self._interval_passed():
+                self.flush(force=True)
+
+    def _interval_passed(self) -> bool:
+        return (
+            self.flush_interval is not None
+            and time.monotonic() - self._flushed_at >= self.flush_interval
+        )
+
+    def flush(self, force: bool = False) -> None:
+        """Записать накопленные изменения в хранилище
+
+        Без `force` запись откладывается, пока не пройдёт `flush_interval` с прошлой записи.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            if (
+                not force
+                and self.flush_interval is not None
+                and not self._interval_passed()
+            ):
+                return
+            self.storage.save_state(self.state)
+            self.saved_state = copy.deepcopy(self.state)
+            self._pending = 0
+            self._flushed_at = time.monotonic()
+
+    def get(self, namespace: str, key: str, saved: bool = False) -> Any:
+        """Получить состояние ключа пространства имён, при `saved` - только уже записанное"""
+        with self._lock:
+            source = self.saved_state if saved else self.state
+            return source.get(namespace, {}).get(key, None)
+
+
+class State:
+    """
+    Класс для хранения состояния при работе с данными, чтобы постоянно не перечитывать данные с начала.
+
+    Состояние одного пайплайна в общем `StateStore`.
+    """
+
+    def __init__(self, store: StateStore, namespace: str):
+        self.store = store
+        self.namespace = namespace
 
     def set_state(self, key: str, value: Any) -> None:
         """Установить состояние для определённого ключа"""
-        self.state[key] = value
-        self.storage.save_state(self.state)
+        self.update({key: value})
+
+    def update(self, values: dict) -> None:
+        """Установить состояние для нескольких ключей одной записью в хранилище"""
+        self.store.update(self.namespace, values)
+
+    def flush(self, force: bool = False) -> None:
+        """Записать накопленные изменения в хранилище"""
+        self.store.flush(force)
 
     def get_state(self, key: str) -> Any:
         """Получить состояние по определённому ключу"""
-        return self.state.get(key, None)
+        return self.store.get(self.namespace, key)
+
+    def get_saved_state(self, key: str) -> Any:
+        """Получить записанное в хранилище состояние по определённому ключу"""
+        return self.store.get(self.namespace, key, saved=True)
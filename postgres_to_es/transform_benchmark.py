@@ -0,0 +1,186 @@
+"""Micro-benchmark of the row transformer against the former per-row dict transformation.
+
+With --workers it also compares wall time of batches transformed in-process and in the
+transform pool, with --enricher the tuple rows are enriched as well. Run from the `postgres_to_es` folder: python transform_benchmark.py --rows 1000000
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Sequence
+
+try:
+    from psycopg2.extras import DictRow
+except ImportError:
+    DictRow = None
+
+from transform_pool import TransformPool
+from transformer import RowTransformer
+
+COLUMNS = (
+    "id",
+    "title",
+    "description",
+    "imdb_rating",
+    "genre",
+    "director",
+    "actors",
+    "writers",
+    "actors_names",
+    "writers_names",
+    "updated_at",
+)
+
+
+def make_rows(count: int) -> List[tuple]:
+    """Get synthetic rows shaped like those of the movies query."""
+    updated_at = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    actors = [{"id": str(uuid.uuid4()), "name": "Actor Name"} for _ in range(3)]
+    return [
+        (
+            str(uuid.UUID(int=number)),
+            f"Title {number}",
+            "Description",
+            7.5,
+            ["Drama", "Comedy"],
+            ["Director Name"],
+            actors,
+            actors[:1],
+            [actor["name"] for actor in actors],
+            ["Actor Name"],
+            updated_at,
+        )
+        for number in range(count)
+    ]
+
+
+def make_dict_rows(values: List[Sequence]) -> List:
+    """Get `DictRow`s the way `DictCursor` builds them, or plain dicts without psycopg2."""
+    if DictRow is None:
+        return [dict(zip(COLUMNS, row)) for row in values]
+    cursor = SimpleNamespace(
+        index={column: position for position, column in enumerate(COLUMNS)},
+        description=COLUMNS,
+    )
+    rows = []
+    for row_values in values:
+        row = DictRow(cursor)
+        row[:] = row_values
+        rows.append(row)
+    return rows
+
+
+def legacy_transform(fields, rows: List[Dict], index: str) -> List[Dict]:
+    """Transformation as it was done before: a dict copy per row and a mapping walk."""
+    transformed = []
+    for row in rows:
+        item_dict = dict(row)
+        result = {"_index": index, **{k: item_dict[k] for k in fields}}
+        result["_id"] = result["id"]
+        transformed.append(result)
+    return transformed
+
+
+def measure(
+    name: str, fetch: Callable[[], List], run: Callable[[List], List[Dict]], rows: int
+) -> None:
+    """Print per row CPU time of the transformation and memory of fetched rows and of the transformation.
+
+    Fetched rows are row objects as a cursor returns them, their values are shared by both
+    variants and left out. Peak is the most memory held while transforming, resulting actions
+    included. Per row copies are freed right away, so they show only as a higher peak.
+    """
+    tracemalloc.start()
+    fetched = fetch()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    gc.disable()
+    try:
+        started = time.process_time()
+        run(fetched)
+        elapsed = time.process_time() - started
+    finally:
+        gc.enable()
+    tracemalloc.start()
+    result = run(fetched)
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:>12}: {elapsed / rows * 1e9:8.1f} ns/row CPU, "
+        f"{held / rows:6.1f} B/row fetched rows, "
+        f"{peak / rows:6.1f} B/row peak, {kept / rows:6.1f} B/row kept"
+    )
+    del result, fetched
+
+
+def measure_pool(
+    transformer: RowTransformer, rows: List[tuple], index: str, workers: int, batch: int
+) -> None:
+    """Print wall time per row of batches transformed in-process and in the transform pool."""
+    batches = [
+        rows[position : position + batch] for position in range(0, len(rows), batch)
+    ]
+    started = time.perf_counter()
+    for rows_batch in batches:
+        [transformer.transform(row, index) for row in rows_batch]
+    in_process = time.perf_counter() - started
+    pool = TransformPool(workers)
+    try:
+        # Workers start and compile the transformer on their first batch.
+        pool.transform(transformer, index, batches[0], False)
+        started = time.perf_counter()
+        for rows_batch in batches:
+            pool.transform(transformer, index, rows_batch, False)
+        pooled = time.perf_counter() - started
+    finally:
+        pool.close()
+    print(
+        f"{'in-process':>12}: {in_process / len(rows) * 1e9:8.1f} ns/row wall, "
+        f"batches of {batch}"
+    )
+    print(f"{f'{workers} workers':>12}: {pooled / len(rows) * 1e9:8.1f} ns/row wall")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--index", default="movies")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--enricher", help="module.function path of an action enricher")
+    args = parser.parse_args()
+
+    with open(f"index/{args.index}.json") as file:
+        fields = tuple(json.load(file)["mappings"]["properties"])
+    rows = make_rows(args.rows)
+    values = [list(row) for row in rows]
+    transformer = RowTransformer(fields, COLUMNS, args.enricher)
+    transform = transformer.transform
+
+    if DictRow is None:
+        print(
+            "psycopg2 is not installed, dict rows are plain dicts instead of DictRows."
+        )
+    measure(
+        "dict rows",
+        lambda: make_dict_rows(values),
+        lambda fetched: legacy_transform(fields, fetched, args.index),
+        args.rows,
+    )
+    measure(
+        "tuple rows",
+        lambda: [tuple(row) for row in values],
+        lambda fetched: [transform(row, args.index) for row in fetched],
+        args.rows,
+    )
+    if args.workers:
+        measure_pool(transformer, rows, args.index, args.workers, args.batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from digests import add_digests
+from transformer import RowTransformer
+
+# Transformers compiled in a worker process, by mapping fields, query columns and enricher.
+_transformers: Dict[
+    Tuple[Tuple[str, ...], Tuple[str, ...], Optional[str]], RowTransformer
+] = {}
+
+
+def transform_rows(
+    fields: Tuple[str, ...],
+    columns: Tuple[str, ...],
+    enricher: Optional[str],
+    index: str,
+    with_digests: bool,
+    rows: List[tuple],
+) -> List[Dict]:
+    """Worker process entry point: transform a chunk of tuple rows into index actions."""
+    key = (fields, columns, enricher)
+    transformer = _transformers.get(key)
+    if transformer is None:
+        transformer = _transformers[key] = RowTransformer(*key)
+    actions = [transformer.transform(row, index) for row in rows]
+    if with_digests:
+        add_digests(actions)
+    return actions
+
+
+class TransformPool:
+    """Transform large batches of tuple rows in worker processes, results keep the row order.
+
+    Pickling rows out and actions back costs the parent several microseconds per row, more
+    than the bare row transformer does, so the pool pays off only with a costly enricher.
+    Measure with transform_benchmark.py --workers before turning it on.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # Spawned workers import the transformation code only, not the parent's connections.
+        self.pool = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+
+    def transform(
+        self,
+        transformer: RowTransformer,
+        index: str,
+        rows: Sequence[tuple],
+        with_digests: bool,
+    ) -> List[Dict]:
+        """Split rows into a chunk per worker and join transformed chunks in order.
+
+        Rows travel as pickled plain tuples, the transformer is compiled in the workers
+        from its fields, columns and enricher path.
+        """
+        size = -(-len(rows) // self.workers)
+        chunks = [
+            rows[position : position + size] for position in range(0, len(rows), size)
+        ]
+        results = self.pool.map(
+            transform_rows,
+            repeat(transformer.fields),
+            repeat(transformer.columns),
+            repeat(transformer.enricher),
+            repeat(index),
+            repeat(with_digests),
+            chunks,
+        )
+        return [action for chunk in results for action in chunk]
+
+    def close(self) -> None:
+        self.pool.shutdown()
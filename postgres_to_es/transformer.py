@@ -0,0 +1,58 @@
+import importlib
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Sequence
+
+# Column of a document encoded by the query, sent to the index as it is.
+DOCUMENT_COLUMN = "document"
+
+
+@lru_cache(maxsize=None)
+def load_enricher(path: str) -> Callable[[Dict], Dict]:
+    """Import a function refining built index actions by its `module.function` path."""
+    module, name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module), name)
+
+
+class RowTransformer:
+    """Build index actions from tuple rows by fixed column positions.
+
+    Compiled once from the index mapping and the columns of the extraction query into
+    a single dict display, so a row costs one dict and no intermediate objects.
+    Rows holding a ready document get it passed through as the raw `_source`.
+    Built actions are passed through the enricher, if any, in-process and in workers alike.
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str],
+        columns: Sequence[str],
+        enricher: Optional[str] = None,
+    ):
+        self.fields = tuple(fields)
+        self.columns = tuple(columns)
+        self.enricher = enricher
+        positions = {column: position for position, column in enumerate(columns)}
+        document = positions.get(DOCUMENT_COLUMN)
+        required = (
+            ("id", "updated_at")
+            if document is not None
+            else (*fields, "id", "updated_at")
+        )
+        missing = [field for field in required if field not in positions]
+        if missing:
+            raise ValueError(f"Query returns no {', '.join(missing)} column(s).")
+        self.id_position = positions["id"]
+        self.updated_at_position = positions["updated_at"]
+        if document is None:
+            items = "".join(f"{field!r}: row[{positions[field]}], " for field in fields)
+        else:
+            items = f"'_source': row[{document}]"
+        # Field names come from the mapping file and positions are integers.
+        build = eval(
+            f"lambda row, index: {{'_index': index, '_id': row[{self.id_position}], {items}}}"
+        )
+        if enricher is None:
+            self.transform: Callable[[Sequence, str], Dict] = build
+        else:
+            enrich = load_enricher(enricher)
+            self.transform = lambda row, index: enrich(build(row, index))
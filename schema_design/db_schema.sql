@@ -15,6 +15,9 @@ create table if not exists content.film_work
     updated_at    timestamp with time zone
 );
 
+create index if not exists film_work_updated_at_id_idx
+    on content.film_work (updated_at, id);
+
 create table if not exists content.genre
 (
     id uuid PRIMARY KEY,
@@ -24,6 +27,9 @@ create table if not exists content.genre
     updated_at  timestamp with time zone
 );
 
+create index if not exists genre_updated_at_id_idx
+    on content.genre (updated_at, id);
+
 create table if not exists content.genre_film_work
 (
     id uuid PRIMARY KEY,
@@ -35,6 +41,9 @@ create table if not exists content.genre_film_work
 create unique index if not exists content_film_work_genre_idx
     on content.genre_film_work (film_work_id, genre_id);
 
+create index if not exists genre_film_work_created_idx
+    on content.genre_film_work (created_at, id);
+
 
 create table if not exists content.person
 (
@@ -45,6 +54,9 @@ create table if not exists content.person
     updated_at timestamp with time zone
 );
 
+create index if not exists person_updated_at_id_idx
+    on content.person (updated_at, id);
+
 create table if not exists content.person_film_work
 (
     id uuid PRIMARY KEY,
@@ -56,3 +68,65 @@ create table if not exists content.person_film_work
 
 create unique index if not exists content_film_work_person_role_idx
     on content.person_film_work (film_work_id, person_id, role);
+
+create index if not exists person_film_work_created_idx
+    on content.person_film_work (created_at, id);
+
+-- ETL change data capture needs film_work_id of deleted links in the WAL.
+alter table content.genre_film_work replica identity full;
+alter table content.person_film_work replica identity full;
+
+-- ETL push mode: notify about ids of film works affected by every change.
+-- The channel must match postgres.notify_channel of the ETL config, the ETL warns otherwise.
+create or replace function content.notify_film_work_changed() returns trigger as
+$$
+declare
+    changed record;
+begin
+    if TG_OP = 'DELETE' then
+        changed := OLD;
+    else
+        changed := NEW;
+    end if;
+
+    if TG_TABLE_NAME = 'film_work' then
+        perform pg_notify('film_work_changed', changed.id::text);
+    elsif TG_TABLE_NAME in ('genre_film_work', 'person_film_work') then
+        perform pg_notify('film_work_changed', changed.film_work_id::text);
+    elsif TG_TABLE_NAME = 'genre' then
+        perform pg_notify('film_work_changed', gfw.film_work_id::text)
+        from content.genre_film_work gfw
+        where gfw.genre_id = changed.id;
+    elsif TG_TABLE_NAME = 'person' then
+        perform pg_notify('film_work_changed', pfw.film_work_id::text)
+        from content.person_film_work pfw
+        where pfw.person_id = changed.id;
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists film_work_notify on content.film_work;
+create trigger film_work_notify
+    after insert or update or delete on content.film_work
+    for each row execute function content.notify_film_work_changed();
+
+drop trigger if exists genre_notify on content.genre;
+create trigger genre_notify
+    after insert or update or delete on content.genre
+    for each row execute function content.notify_film_work_changed();
+
+drop trigger if exists person_notify on content.person;
+create trigger person_notify
+    after insert or update or delete on content.person
+    for each row execute function content.notify_film_work_changed();
+
+drop trigger if exists genre_film_work_notify on content.genre_film_work;
+create trigger genre_film_work_notify
+    after insert or update or delete on content.genre_film_work
+    for each row execute function content.notify_film_work_changed();
+
+drop trigger if exists person_film_work_notify on content.person_film_work;
+create trigger person_film_work_notify
+    after insert or update or delete on content.person_film_work
+    for each row execute function content.notify_film_work_changed();